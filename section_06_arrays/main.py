@@ -1,14 +1,48 @@
+import array
+import heapq
 import logging
-from typing import List
+import mmap
+import os
+import sys
+import tempfile
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, we only need it for the numeric fast path
+    np = None
 
 logger = logging.getLogger(__name__)
 
+# array.array typecodes that hold numbers (everything but the unicode ones, "u" and "w")
+_NUMERIC_TYPECODES = "bBhHiIlLqQfd"
+
+
+def _is_numeric_array(obj: Any) -> bool:
+    """
+    True if `obj` is a typed numeric buffer (array.array or numpy.ndarray)
+    rather than a plain python list/str.
+    """
+    if isinstance(obj, array.array):
+        return obj.typecode in _NUMERIC_TYPECODES
+    return np is not None and isinstance(obj, np.ndarray) and obj.dtype.kind in "iufb"
+
 
-def reverse_string(src: str) -> str:
+def reverse_string(
+    src: Union[str, array.array, "np.ndarray"],
+) -> Union[str, array.array, "np.ndarray"]:
     """
     reverse_string("hello world")
     => "dlrow olleh"
+
+    Numeric arrays (array.array / numpy.ndarray) skip the python loop, see `_reverse_numeric`,
+    and come back as the same type.
     """
+    if _is_numeric_array(src):
+        return _reverse_numeric(src)
     src_rev = []
     n = len(src)
     for i in range(n):
@@ -59,7 +93,11 @@ def merge_sorted_arrays(a: List[int], b: List[int]) -> List[int]:
 
     merge_sorted_arrays([0, 3, 4, 31], [4, 6, 30])
     => [0, 3, 4, 4, 6, 30, 31]
+
+    Numeric arrays (array.array / numpy.ndarray) skip the python loop, see `_merge_numeric`.
     """
+    if _is_numeric_array(a) and _is_numeric_array(b):
+        return _merge_numeric(a, b)
     c = []
     a_i, b_i = 0, 0
     a_val, b_val = a[a_i], b[b_i]
@@ -92,9 +130,472 @@ def merge_sorted_arrays(a: List[int], b: List[int]) -> List[int]:
     return c
 
 
+def _reverse_numeric(src):
+    """
+    Reverse a numeric array without touching the elements one by one in python.
+
+    For numpy, src[::-1] is a *view* with a negative stride, so it's O(1) and zero-copy.
+    For array.array, slicing copies the underlying C buffer in one go (like memcpy).
+    """
+    return src[::-1]
+
+
+def reverse_utf8_buffer(src, dst, chunk_size: int = 1 << 20) -> int:
+    """
+    Reverse the code points of a UTF-8 encoded buffer, one chunk at a time.
+
+    `src` is anything that supports the buffer protocol (bytes, memoryview, mmap..).
+    `dst` is either a writable buffer of the same length (bytearray, mmap..) or a
+    binary file object. Only one chunk is ever decoded, so memory stays O(chunk_size)
+    no matter how big `src` is.
+
+    We walk `src` backwards. The trick is to never cut a multi-byte character in half:
+    UTF-8 continuation bytes always look like 0b10xxxxxx, so if a chunk would start on
+    one, we move the start back until we hit the first byte of that character.
+    Reversing code points doesn't change the number of bytes, so the reversed chunk
+    covering src[start:end] belongs at dst[n - end:n - start]. Since `end` only goes
+    down, the output is written front to back, which also suits files.
+
+    Returns the number of bytes written.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    view = memoryview(src).cast("B")
+    n = len(view)
+    out = None if hasattr(dst, "write") else memoryview(dst).cast("B")
+    end = n
+    while end > 0:
+        start = max(0, end - chunk_size)
+        while start > 0 and view[start] & 0xC0 == 0x80:
+            start -= 1
+        chunk = bytes(view[start:end]).decode("utf-8")[::-1].encode("utf-8")
+        if out is None:
+            dst.write(chunk)
+        else:
+            out[n - end : n - start] = chunk
+        end = start
+    view.release()
+    if out is not None:
+        out.release()
+    return n
+
+
+def reverse_file(src_path: str, dst: BinaryIO, chunk_size: int = 1 << 20) -> int:
+    """
+    Reverse a (possibly multi-GB) UTF-8 file without reading it into memory.
+    The input is memory-mapped, so the OS pages it in as the chunks are read.
+    `dst` is a path or an open binary file object.
+    """
+    with open(src_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            src = b""  # an empty file can't be memory-mapped
+        else:
+            src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if hasattr(dst, "write"):
+                return reverse_utf8_buffer(src, dst, chunk_size)
+            with open(dst, "wb") as out:
+                return reverse_utf8_buffer(src, out, chunk_size)
+        finally:
+            if isinstance(src, mmap.mmap):
+                src.close()
+
+
+def _merge_numeric(a, b):
+    """
+    Vectorized merge of two sorted numeric arrays.
+
+    With numpy, we can compute the final position of every element directly:
+      - a[i] goes after i items of a, and after every item of b that is strictly smaller
+      - b[j] goes after j items of b, and after every item of a that is smaller or equal
+    np.searchsorted gives us those counts for all elements at once, so we can scatter
+    both inputs into the output without a python-level loop. Ties keep `a` first,
+    which matches `merge_sorted_arrays`.
+
+    Without numpy (array.array only), concatenate the C buffers and let timsort do
+    the work. Timsort detects the two pre-sorted runs, so this is a single linear merge.
+
+    Two array.arrays with different typecodes are converted with `_common_typecode`
+    first, with or without numpy. Mixing signed ints with unsigned 64-bit ints raises
+    TypeError rather than losing precision in float64 (which is what numpy would pick).
+    """
+    both_arrays = isinstance(a, array.array) and isinstance(b, array.array)
+    if np is not None:
+        a_np = np.frombuffer(a, dtype=a.typecode) if isinstance(a, array.array) else a
+        b_np = np.frombuffer(b, dtype=b.typecode) if isinstance(b, array.array) else b
+        if both_arrays:
+            dtype = np.dtype(_common_typecode(a.typecode, b.typecode))
+        else:
+            dtype = np.result_type(a_np, b_np)
+            if dtype.kind == "f" and {a_np.dtype.kind, b_np.dtype.kind} == {"i", "u"}:
+                raise TypeError(
+                    f"Can't merge {a_np.dtype} and {b_np.dtype} without losing precision"
+                )
+        c = np.empty(len(a_np) + len(b_np), dtype=dtype)
+        _merge_numeric_into(a_np, b_np, c)
+        if both_arrays:
+            # hand back the same type we were given
+            return array.array(_common_typecode(a.typecode, b.typecode), c.tobytes())
+        return c
+    if a.typecode != b.typecode:
+        typecode = _common_typecode(a.typecode, b.typecode)
+        a, b = array.array(typecode, a), array.array(typecode, b)
+    return array.array(a.typecode, sorted(a + b))
+
+
+def _common_typecode(a: str, b: str) -> str:
+    """
+    The typecode two arrays are converted to before they're merged:
+    the same one if they match, "d" if either holds floats, "Q" if both are unsigned,
+    otherwise "q". There's no integer type for a signed array plus an unsigned 64-bit
+    one ("Q", or "L" where it's 8 bytes), so that raises TypeError.
+    """
+    if a == b:
+        return a
+    if a in "fd" or b in "fd":
+        return "d"
+    if a in "BHILQ" and b in "BHILQ":
+        return "Q"
+    if any(t in "LQ" and array.array(t).itemsize == 8 for t in (a, b)):
+        raise TypeError(f"Can't merge '{a}' and '{b}' arrays without losing precision")
+    return "q"
+
+
+def _merge_numeric_into(a, b, out) -> None:
+    """
+    The numpy scatter from `_merge_numeric`, writing into an existing array `out`
+    (which can be a view into a bigger buffer, eg. shared memory).
+    """
+    out[np.arange(len(a)) + np.searchsorted(b, a, side="left")] = a
+    out[np.arange(len(b)) + np.searchsorted(a, b, side="right")] = b
+
+
+# Output items a merge worker handles at once. Its temporary memory is O(this),
+# however big the inputs are.
+_MERGE_CHUNK = 1 << 16
+
+
+def _co_rank(k: int, a, b) -> int:
+    """
+    The "merge path" / co-rank trick.
+    The first k items of merge(a, b) are always a[:i] + b[:k - i] for exactly one i.
+    We can binary search for that i without merging anything:
+
+      - if a[i - 1] > b[j] then we took too many items from a, move left
+      - if b[j - 1] >= a[i] then we took too few items from a, move right
+        (>= rather than > because ties go to `a` first, like `merge_sorted_arrays`)
+
+    Time complexity: O(log(min(len(a), len(b))))
+    """
+    a_len, b_len = len(a), len(b)
+    lo, hi = max(0, k - b_len), min(k, a_len)
+    while True:
+        i = (lo + hi) // 2
+        j = k - i
+        if i > 0 and j < b_len and a[i - 1] > b[j]:
+            hi = i - 1
+        elif j > 0 and i < a_len and b[j - 1] >= a[i]:
+            lo = i + 1
+        else:
+            return i
+
+
+def _merge_path_worker(args) -> None:
+    """
+    Merges output positions [k_start, k_end) straight into the shared output buffer.
+    Every worker finds its own slice of a and b with `_co_rank`, so no two workers
+    ever write to the same place and no locking is needed.
+
+    The segment is merged `_MERGE_CHUNK` items at a time (each chunk is cut with
+    `_co_rank` again), so a worker never holds more than one chunk outside shared memory.
+    """
+    names, lengths, typecode, k_start, k_end = args
+    shms = [shared_memory.SharedMemory(name=name) for name in names]
+    itemsize = array.array(typecode).itemsize
+    views = [shm.buf[: n * itemsize].cast(typecode) for shm, n in zip(shms, lengths)]
+    try:
+        a, b, out = views
+        if np is not None:
+            # zero-copy numpy arrays over the same shared memory
+            a_np, b_np, out_np = (
+                np.frombuffer(shm.buf, dtype=typecode, count=n)
+                for shm, n in zip(shms, lengths)
+            )
+        i_start = _co_rank(k_start, a, b)
+        for k in range(k_start, k_end, _MERGE_CHUNK):
+            k_next = min(k + _MERGE_CHUNK, k_end)
+            i_end = _co_rank(k_next, a, b)
+            j_start, j_end = k - i_start, k_next - i_end
+            if np is not None:
+                _merge_numeric_into(
+                    a_np[i_start:i_end], b_np[j_start:j_end], out_np[k:k_next]
+                )
+            else:
+                # Both slices are sorted runs, so timsort merges them in one linear
+                # pass (in C). It's stable, so ties keep `a` first.
+                merged = sorted(a[i_start:i_end].tolist() + b[j_start:j_end].tolist())
+                out[k:k_next] = array.array(typecode, merged)
+            i_start = i_end
+    finally:
+        if np is not None:
+            # they hold exports of shm.buf, which close() needs gone
+            del a_np, b_np, out_np
+        for view in views:
+            view.release()
+        for shm in shms:
+            shm.close()
+
+
+def _copy_into_shared(shm: shared_memory.SharedMemory, src, typecode: str) -> None:
+    """
+    Writes `src` into `shm` as C values of `typecode`, without building a full
+    converted copy first: buffers of the same type are copied byte for byte,
+    anything else is converted `_MERGE_CHUNK` items at a time.
+    """
+    itemsize = array.array(typecode).itemsize
+    dst = shm.buf[: len(src) * itemsize]
+    try:
+        if isinstance(src, array.array) and src.typecode == typecode:
+            dst[:] = memoryview(src).cast("B")
+        elif np is not None and isinstance(src, np.ndarray):
+            np.frombuffer(dst, dtype=typecode)[:] = src
+        else:
+            for k in range(0, len(src), _MERGE_CHUNK):
+                chunk = array.array(typecode, src[k : k + _MERGE_CHUNK])
+                dst[k * itemsize : k * itemsize + len(chunk) * itemsize] = memoryview(
+                    chunk
+                ).cast("B")
+    finally:
+        dst.release()
+
+
+def _typecode_of(src) -> str:
+    """
+    The array typecode that holds the values of `src`
+    (for a list: "d" if any of its values is a float, otherwise "q").
+    """
+    if isinstance(src, array.array):
+        return src.typecode
+    if np is not None and isinstance(src, np.ndarray):
+        if src.dtype.char not in _NUMERIC_TYPECODES:
+            raise TypeError(f"Can't merge {src.dtype} arrays in shared memory")
+        return src.dtype.char
+    return "d" if any(isinstance(v, float) for v in src) else "q"
+
+
+def merge_sorted_arrays_parallel(a, b, workers: int = None, typecode: str = None):
+    """
+    Merge two huge sorted numeric arrays using several processes.
+
+    The output is split into `workers` equal segments. For every segment boundary k,
+    `_co_rank` tells us where to cut a and b, so each segment can be merged
+    independently of the others (this is called "merge path" partitioning).
+
+    a, b and the output live in shared memory, so the workers read the inputs and
+    write their segment of the output in place, without pickling the data.
+    Apart from the shared memory, the only full-size copy is the returned result.
+
+    Both inputs are stored with one `typecode`, by default the `_common_typecode`
+    of their values (so ints and floats can be mixed, like in `merge_sorted_arrays`).
+
+    Returns the same type as `merge_sorted_arrays(a, b)`: an array.array for two
+    array.arrays, a numpy array for two numeric arrays when one of them is numpy,
+    otherwise a list. The values are identical too.
+    """
+    workers = workers or os.cpu_count() or 1
+    typecode = typecode or _common_typecode(_typecode_of(a), _typecode_of(b))
+    lengths = (len(a), len(b), len(a) + len(b))
+    itemsize = array.array(typecode).itemsize
+    shms = [
+        shared_memory.SharedMemory(create=True, size=max(itemsize, n * itemsize))
+        for n in lengths
+    ]
+    try:
+        for shm, src in zip(shms, (a, b)):
+            _copy_into_shared(shm, src, typecode)
+        n = lengths[2]
+        bounds = [n * w // workers for w in range(workers + 1)]
+        names = [shm.name for shm in shms]
+        tasks = [
+            (names, lengths, typecode, bounds[w], bounds[w + 1])
+            for w in range(workers)
+            if bounds[w] < bounds[w + 1]
+        ]
+        with ProcessPoolExecutor(max_workers=len(tasks) or 1) as pool:
+            list(pool.map(_merge_path_worker, tasks))
+        result = shms[2].buf[: n * itemsize]
+        try:
+            if not (_is_numeric_array(a) and _is_numeric_array(b)):
+                out = result.cast(typecode).tolist()
+            elif isinstance(a, array.array) and isinstance(b, array.array):
+                out = array.array(typecode)
+                out.frombytes(result)
+            else:
+                out = np.frombuffer(result, dtype=typecode).copy()
+        finally:
+            result.release()
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    return out
+
+
+def merge_sorted_iterables(
+    *iterables: Iterable[Any], key: Callable[[Any], Any] = None
+) -> Iterator[Any]:
+    """
+    A streaming k-way merge. Takes any number of sorted iterables (lists, file readers,
+    other generators..) and yields their items lazily in sorted order.
+
+    The idea is to keep only the *current* head of every input in a min heap.
+    We pop the smallest head, yield it, then push the next item from the same input.
+    The heap never holds more than k items, so memory is O(k) no matter how large
+    the inputs are. Each item costs one push + one pop, so time is O(n log k).
+
+    Heap entries look like (key, input_index, value, iterator). When two keys are
+    equal, the input index breaks the tie, so items from earlier inputs come first
+    (ie. the merge is stable, just like `merge_sorted_arrays`). It also means the
+    values themselves are never compared.
+
+    list(merge_sorted_iterables([0, 3, 4, 31], [4, 6, 30]))
+    => [0, 3, 4, 4, 6, 30, 31]
+    list(merge_sorted_iterables(["b", "C"], ["a", "D"], key=str.lower))
+    => ["a", "b", "C", "D"]
+    """
+    heap = []
+    for i, iterable in enumerate(iterables):
+        it = iter(iterable)
+        for value in it:
+            # only take the first item, the rest stay in the input until needed
+            heap.append((value if key is None else key(value), i, value, it))
+            break
+    heapq.heapify(heap)
+    while heap:
+        _, i, value, it = heap[0]
+        yield value
+        for nxt in it:
+            # replace the head of the heap with the next item from the same input
+            heapq.heapreplace(heap, (nxt if key is None else key(nxt), i, nxt, it))
+            break
+        else:
+            # this input is exhausted, so it no longer takes part in the merge
+            heapq.heappop(heap)
+
+
+def benchmark_numeric_fast_path(n: int = 1_000_000, number: int = 3) -> None:
+    """
+    Compare the python list path against the numeric fast path.
+    Run with `python -m section_06_arrays.main --benchmark`
+    """
+    a_list = list(range(0, 2 * n, 2))
+    b_list = list(range(1, 2 * n, 2))
+    # the python path reverses a str of the same length (it only knows how to join strs)
+    inputs = {
+        "list": (a_list, b_list, "x" * n),
+        "array.array": (array.array("q", a_list), array.array("q", b_list), None),
+    }
+    if np is not None:
+        inputs["numpy"] = (np.array(a_list), np.array(b_list), None)
+    for name, (a, b, src) in inputs.items():
+        src = a if src is None else src
+        t_merge = timeit.timeit(lambda: merge_sorted_arrays(a, b), number=number)
+        t_rev = timeit.timeit(lambda: reverse_string(src), number=number)
+        print(
+            f"{name:>12}: merge {t_merge / number * 1000:9.2f} ms, "
+            f"reverse {t_rev / number * 1000:9.2f} ms (n={n})"
+        )
+
+
+def benchmark_parallel_merge(n: int = 5_000_000) -> None:
+    """
+    Compare the serial numeric merge against `merge_sorted_arrays_parallel`
+    with an increasing number of worker processes.
+    """
+    a = array.array("q", range(0, 2 * n, 2))
+    b = array.array("q", range(1, 2 * n, 2))
+    t_serial = timeit.timeit(lambda: merge_sorted_arrays(a, b), number=1)
+    print(f"{'serial':>12}: {t_serial * 1000:9.2f} ms (n={2 * n})")
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        t = timeit.timeit(lambda: merge_sorted_arrays_parallel(a, b, workers), number=1)
+        print(f"{workers:>4} workers: {t * 1000:9.2f} ms, speedup x{t_serial / t:.2f}")
+        workers *= 2
+
+
 def main():
     assert reverse_string("hello world") == "dlrow olleh"
     assert merge_sorted_arrays([0, 3, 4, 31], [4, 6, 30]) == [0, 3, 4, 4, 6, 30, 31]
+    assert list(
+        merge_sorted_iterables([0, 3, 4, 31], [4, 6, 30])
+    ) == merge_sorted_arrays([0, 3, 4, 31], [4, 6, 30])
+    assert list(
+        merge_sorted_iterables([1, 5], iter([2, 3]), (x for x in [0, 9]), [])
+    ) == [0, 1, 2, 3, 5, 9]
+    # items with equal keys keep the order of their inputs
+    pairs = list(
+        merge_sorted_iterables([(1, "a"), (2, "a")], [(1, "b")], key=lambda p: p[0])
+    )
+    assert pairs == [(1, "a"), (1, "b"), (2, "a")]
+    assert list(merge_sorted_iterables()) == []
+    # numeric fast path
+    a, b = array.array("q", [0, 3, 4, 31]), array.array("q", [4, 6, 30])
+    assert merge_sorted_arrays(a, b) == array.array("q", [0, 3, 4, 4, 6, 30, 31])
+    assert reverse_string(a) == array.array("q", [31, 4, 3, 0])
+    if np is not None:
+        c = merge_sorted_arrays(np.array([0, 3, 4, 31]), np.array([4, 6, 30]))
+        assert c.tolist() == [0, 3, 4, 4, 6, 30, 31]
+        assert reverse_string(np.array([1, 2, 3])).tolist() == [3, 2, 1]
+    # parallel merge path
+    for a, b in (([0, 3, 4, 31], [4, 6, 30]), ([1, 1, 2], [1, 1, 1, 3]), ([5], [])):
+        for workers in (1, 2, 3, 8):
+            assert merge_sorted_arrays_parallel(a, b, workers) == sorted(a + b)
+    mixed = _merge_numeric(array.array("i", [-2, 5]), array.array("q", [1, 2**40]))
+    assert mixed == array.array("q", [-2, 1, 5, 2**40])
+    mixed = _merge_numeric(array.array("B", [1, 3]), array.array("d", [2.5]))
+    assert mixed.tolist() == [1, 2.5, 3]
+    assert not _is_numeric_array(array.array("u", "ab"))
+    mixed = _merge_numeric(array.array("B", [7]), array.array("Q", [2**63 + 5]))
+    assert mixed == array.array("Q", [7, 2**63 + 5])
+    try:
+        _merge_numeric(array.array("q", [-1]), array.array("Q", [2**63 + 5]))
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+    a = array.array("q", range(0, 1000, 3))
+    b = array.array("q", range(0, 1000, 2))
+    assert merge_sorted_arrays_parallel(a, b, 4) == merge_sorted_arrays(a, b)
+    floats = array.array("d", [0.5, 1.5, 2.5])
+    for a, b in ((a, floats), (floats, a), ([0.5, 2.5], [1, 2]), ([1, 3], [2.5])):
+        assert merge_sorted_arrays_parallel(a, b, 2) == merge_sorted_arrays(a, b)
+    assert merge_sorted_arrays_parallel(a, b, 2) == [1, 2.5, 3]
+    if np is not None:
+        a, b = np.array([0.5, 1.5, 2.5]), np.array([1.0, 2.0])
+        c = merge_sorted_arrays_parallel(a, b, 2)
+        assert isinstance(c, np.ndarray) and c.tolist() == [0.5, 1.0, 1.5, 2.0, 2.5]
+    # chunked utf-8 reversal (chunks smaller than a character still work)
+    text = "héllo wörld 👋 日本"
+    for chunk_size in (1, 2, 3, 5, 1 << 20):
+        out = bytearray(len(text.encode()))
+        reverse_utf8_buffer(text.encode(), out, chunk_size)
+        assert out.decode() == text[::-1] == reverse_string(text)
+    try:
+        reverse_utf8_buffer(text.encode(), bytearray(len(text.encode())), 0)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path, dst_path = os.path.join(tmp, "src.txt"), os.path.join(tmp, "dst.txt")
+        for content in (text * 100, ""):
+            data = content.encode()
+            with open(src_path, "wb") as f:
+                f.write(data)
+            assert reverse_file(src_path, dst_path, chunk_size=7) == len(data)
+            with open(dst_path, "rb") as f:
+                assert f.read().decode() == content[::-1]
+    if "--benchmark" in sys.argv:
+        benchmark_numeric_fast_path()
+        benchmark_parallel_merge()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,22 @@
 import logging
 import os
-from typing import Any
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from section_07_hash_tables.main import OpenAddressingHashTable
 
 LOGLEVEL = os.getenv("LOGLEVEL", "INFO").upper()
 logging.basicConfig(level=LOGLEVEL)
 
 
 class Node:
+    # __slots__ stores the 3 attributes in fixed positions instead of a per-instance __dict__,
+    # which saves ~40 bytes per node (see `measure_node_memory`).
+    __slots__ = ("value", "next", "prev")
+
     def __init__(self, value: Any) -> None:
         self.value = value
         self.next: Node = None
@@ -14,17 +24,59 @@ class Node:
         self.prev: Node = None
 
 
+class NodePool:
+    """
+    A free list of nodes. Instead of letting removed nodes be garbage collected and
+    allocating new ones later, `release` keeps up to `max_size` of them around and
+    `acquire` hands them out again. Useful when nodes are added/removed at a high rate.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self._free = []
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    def acquire(self, value: Any) -> Node:
+        if self._free:
+            node = self._free.pop()
+            node.value = value
+            return node
+        return Node(value)
+
+    def release(self, node: Node) -> None:
+        # drop references so the pool doesn't keep values (or other nodes) alive
+        node.value = node.next = node.prev = None
+        if len(self._free) < self.max_size:
+            self._free.append(node)
+
+
 class DoublyLinkedList:
     """
     An implementation of a *doubly* linked list.
     To make this a singly linked list, just remove the lines with "prev"
+
+    Pass a `NodePool` to recycle removed nodes (it can be shared between lists).
+
+    append/prepend/insert return the new node. Hold on to it, and you can later
+    remove it, insert next to it or move it to the front in O(1), without traversing.
+    (If the list has a pool, a removed node is recycled, so drop the handle after removing it.)
     """
 
-    def __init__(self, value: Any) -> None:
-        self.head = Node(value)
+    def __init__(self, value: Any, pool: NodePool = None) -> None:
+        self._pool = pool
+        self.head = self._new_node(value)
         self.tail = self.head
         self.length = 1
 
+    def _new_node(self, value: Any) -> Node:
+        return Node(value) if self._pool is None else self._pool.acquire(value)
+
+    def _free_node(self, node: Node) -> None:
+        if self._pool is not None:
+            self._pool.release(node)
+
     def __len__(self):
         return self.length
 
@@ -34,6 +86,8 @@ class DoublyLinkedList:
         Arrows show prev/next relationship (ie. if relationship doesn't exist, no arrow)
         """
         cursor = self.head
+        if cursor is None:
+            return ""
         s = str(cursor.value)
         while cursor.next:
             if cursor.next.prev == cursor:
@@ -43,7 +97,25 @@ class DoublyLinkedList:
             cursor = cursor.next
         return s
 
-    def append(self, value: Any) -> None:
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Yields the values from head to tail. Read `next` before yielding, so
+        the current node can be removed while iterating.
+        """
+        node = self.head
+        while node is not None:
+            nxt = node.next
+            yield node.value
+            node = nxt
+
+    def __reversed__(self) -> Iterator[Any]:
+        node = self.tail
+        while node is not None:
+            prv = node.prev
+            yield node.value
+            node = prv
+
+    def append(self, value: Any) -> Node:
         """
         self.tail is a reference to the last element of self.head, so they're
         referencing the same object in memory. Therefore, an update to self.tail.next
@@ -52,25 +124,33 @@ class DoublyLinkedList:
         To make this a doubly linked list, we tell the new node its prev is self.tail.
         Time complexity: O(1)
         """
-        new = Node(value)
-        new.prev = self.tail
-        self.tail.next = new
-        self.tail = new
+        new = self._new_node(value)
+        if self.tail is None:
+            self.head = self.tail = new
+        else:
+            new.prev = self.tail
+            self.tail.next = new
+            self.tail = new
         self.length += 1
+        return new
 
-    def prepend(self, value: Any) -> None:
+    def prepend(self, value: Any) -> Node:
         """
         Same strategy as append.
         To make this a doubly linked list, we tell the previous head its prev is the new node.
         Time complexity: O(1)
         """
-        new = Node(value)
-        new.next = self.head
-        self.head.prev = new
-        self.head = new
+        new = self._new_node(value)
+        if self.head is None:
+            self.head = self.tail = new
+        else:
+            new.next = self.head
+            self.head.prev = new
+            self.head = new
         self.length += 1
+        return new
 
-    def insert(self, index: int, value: Any) -> None:
+    def insert(self, index: int, value: Any) -> Node:
         """
         Assuming we have the following list:
 
@@ -89,19 +169,74 @@ class DoublyLinkedList:
                          O(n) if somewhere in the middle.
         """
         if index <= 0:
-            self.prepend(value)
+            return self.prepend(value)
         elif index >= self.length - 1:
-            self.append(value)
+            return self.append(value)
         else:
             pre = self._traverse_to_index(index - 1)
-            new = Node(value)
-            # link new node and node after it
-            new.next = pre.next
-            pre.next.prev = new
-            # link new node and node before it
-            new.prev = pre
-            pre.next = new
-            self.length += 1
+            return self.insert_after(pre, value)
+
+    def insert_after(self, node: Node, value: Any) -> Node:
+        """
+        Same linking as `insert`, but we already have the node before the new one.
+        Time complexity: O(1)
+        """
+        if node is self.tail:
+            return self.append(value)
+        new = self._new_node(value)
+        # link new node and node after it
+        new.next = node.next
+        node.next.prev = new
+        # link new node and node before it
+        new.prev = node
+        node.next = new
+        self.length += 1
+        return new
+
+    def insert_before(self, node: Node, value: Any) -> Node:
+        """
+        Time complexity: O(1)
+        """
+        if node is self.head:
+            return self.prepend(value)
+        return self.insert_after(node.prev, value)
+
+    def _unlink(self, node: Node) -> None:
+        """
+        Connects the neighbours of `node` to each other, updating head/tail if needed.
+        """
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+        node.prev = node.next = None
+
+    def remove_node(self, node: Node) -> Any:
+        """
+        Removes `node` (which must belong to this list) and returns its value.
+        Unlike `remove`, we don't need to find the node before it: `node.prev` is right there.
+        Time complexity: O(1)
+        """
+        value = node.value
+        self._unlink(node)
+        self.length -= 1
+        self._free_node(node)
+        return value
+
+    def move_to_front(self, node: Node) -> None:
+        """
+        Time complexity: O(1)
+        """
+        if node is self.head:
+            return
+        self._unlink(node)
+        node.next = self.head
+        self.head.prev = node
+        self.head = node
 
     def remove(self, index):
         """
@@ -119,31 +254,124 @@ class DoublyLinkedList:
         it, then we set node_before.next = node_after and let the garbage collector clean
         up the node at index.
 
-        Time complexity: O(1) if index == 0, otherwise O(n)
+        Since every node knows its neighbours, once we've found the node, `remove_node`
+        does all of that (and also handles removing the only node of the list).
+        Removing from an empty list does nothing.
+
+        Time complexity: O(1) for the head or tail, otherwise O(n)
         """
+        if self.length == 0:
+            logging.debug("Removing index=%s from an empty list", index)
+            return
         index_safe = min(max(index, 0), self.length - 1)
-        is_head = index_safe == 0
-        is_tail = index_safe == self.length - 1
         logging.debug(
-            f"Removing index={index}, index_safe={index_safe}, length={self.length}, "
-            f"is_head={is_head}, is_tail={is_tail}"
+            "Removing index=%s, index_safe=%s, length=%s",
+            index,
+            index_safe,
+            self.length,
         )
-        logging.debug(f"Before removal: {self}")
-        if is_head:
-            logging.debug(f"Removing head node (value {self.head.value})")
-            self.head.next.prev = None
-            self.head = self.head.next
+        # Pass `self` as an argument, so the (O(n)) string is only built if debug is enabled
+        logging.debug("Before removal: %s", self)
+        self.remove_node(self._traverse_to_index(index_safe))
+        logging.debug("After removal: %s", self)
+
+    @classmethod
+    def _from_chain(
+        cls, head: Node, tail: Node, length: int, pool: NodePool = None
+    ) -> "DoublyLinkedList":
+        """
+        Wraps already-linked nodes in a new list (without calling __init__, which needs a value).
+        """
+        new = cls.__new__(cls)
+        new._pool = pool
+        new.head, new.tail, new.length = head, tail, length
+        return new
+
+    def _take(self, other: "DoublyLinkedList") -> Tuple[Node, Node, int]:
+        """
+        Empties `other` and returns (head, tail, length) of the nodes it had.
+        """
+        chain = other.head, other.tail, other.length
+        other.head = other.tail = None
+        other.length = 0
+        return chain
+
+    def _link_chain(self, pre: Node, head: Node, tail: Node, length: int) -> None:
+        """
+        Links the chain head..tail in after `pre` (or at the front if pre is None).
+        Only the 4 pointers around the two joints change, whatever the chain length.
+        """
+        if head is None:
+            return
+        aft = self.head if pre is None else pre.next
+        head.prev, tail.next = pre, aft
+        if pre is None:
+            self.head = head
+        else:
+            pre.next = head
+        if aft is None:
+            self.tail = tail
         else:
-            pre = self._traverse_to_index(index_safe - 1)
-            if is_tail:
-                logging.debug(f"Removing tail node (value {pre.next.value})")
-                pre.next = None
+            aft.prev = tail
+        self.length += length
+
+    def extend(self, values: Iterable[Any]) -> None:
+        """
+        Builds a chain of new nodes on the side, then links it to the tail in one go.
+        Time complexity: O(k) for k values
+        """
+        head = tail = None
+        count = 0
+        for value in values:
+            new = self._new_node(value)
+            if tail is None:
+                head = new
             else:
-                aft = pre.next.next
-                aft.prev = pre
-                pre.next = aft
-        self.length -= 1
-        logging.debug(f"After removal: {self}")
+                tail.next, new.prev = new, tail
+            tail = new
+            count += 1
+        self._link_chain(self.tail, head, tail, count)
+
+    def concat(self, other: "DoublyLinkedList") -> "DoublyLinkedList":
+        """
+        Moves all of `other`'s nodes to the end of this list. `other` is left empty.
+        Time complexity: O(1)
+        """
+        self._link_chain(self.tail, *self._take(other))
+        return self
+
+    def splice(self, index: int, other: "DoublyLinkedList") -> "DoublyLinkedList":
+        """
+        Moves all of `other`'s nodes into this list, so the first one ends up at `index`.
+        `other` is left empty. Relinking is O(1), finding `index` is O(n) (O(1) at either end).
+        """
+        if index <= 0:
+            pre = None
+        elif index >= self.length:
+            pre = self.tail
+        else:
+            pre = self._traverse_to_index(index - 1)
+        self._link_chain(pre, *self._take(other))
+        return self
+
+    def split_at(self, index: int) -> "DoublyLinkedList":
+        """
+        Cuts this list in two: this list keeps [0, index), the returned list gets the
+        nodes from `index` on (no copying). Time complexity: O(n) to find `index`, O(1) to cut.
+        """
+        index = min(max(index, 0), self.length)
+        if index == self.length:
+            return self._from_chain(None, None, 0, self._pool)
+        first = self._traverse_to_index(index)
+        new = self._from_chain(first, self.tail, self.length - index, self._pool)
+        self.tail = first.prev
+        if self.tail is None:
+            self.head = None
+        else:
+            self.tail.next = None
+        first.prev = None
+        self.length = index
+        return new
 
     def reverse(self) -> "DoublyLinkedList":
         """
@@ -169,7 +397,7 @@ class DoublyLinkedList:
           Iterate until completion, then update head/tail nodes.
 
         """
-        if self.length == 1:
+        if self.length <= 1:
             return self
 
         # 1. Here's how to accomplish reverse by copying the list
@@ -194,6 +422,8 @@ class DoublyLinkedList:
             first = second
             second = temp
         self.head.next = None
+        # the new head still points back at its old neighbour
+        first.prev = None
         self.head = first
         return self
 
@@ -218,6 +448,331 @@ class DoublyLinkedList:
         return c
 
 
+class _Block:
+    __slots__ = ("items", "next", "prev")
+
+    def __init__(self, items: List[Any]) -> None:
+        self.items = items
+        self.next: _Block = None
+        self.prev: _Block = None
+
+
+class UnrolledLinkedList:
+    """
+    An "unrolled" linked list: a doubly linked list of blocks, where each block is a
+    small python list holding up to `block_size` values.
+
+      [a b c d] <--> [e f] <--> [g h i]
+
+    To find index i, we hop from block to block (subtracting each block's length)
+    instead of from node to node, then index into the block directly.
+    Inserting/removing inside a block shifts at most `block_size` items, which python
+    does with a single memmove.
+
+    So get/insert/remove by position cost O(n / block_size + block_size). That's O(sqrt n)
+    when block_size is around sqrt(n) (the default of 1024 suits ~1M values), and it's
+    much friendlier to the CPU cache than one object per value.
+
+    Blocks that grow past `block_size` are split in half. A block that shrinks is merged
+    into its neighbour once both fit in half a block, so blocks stay reasonably full.
+    Uses the same method names as `DoublyLinkedList`.
+    """
+
+    def __init__(self, value: Any, block_size: int = 1024) -> None:
+        assert block_size >= 2
+        self.block_size = block_size
+        self.head = self.tail = _Block([value])
+        self.length = 1
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[Any]:
+        block = self.head
+        while block is not None:
+            yield from block.items
+            block = block.next
+
+    def __str__(self) -> str:
+        return " <--> ".join(map(str, self))
+
+    def __getitem__(self, index: int) -> Any:
+        return self.get(index)
+
+    def _locate(self, index: int) -> Tuple[_Block, int]:
+        """
+        Returns (block, position in block) for `index`, starting from the closer end.
+        For index == length, returns the position just past the last value.
+        """
+        if index <= self.length // 2:
+            block = self.head
+            while index > len(block.items) or (
+                index == len(block.items) and block.next is not None
+            ):
+                index -= len(block.items)
+                block = block.next
+            return block, index
+        index = self.length - index  # number of values at or after index
+        block = self.tail
+        while index > len(block.items):
+            index -= len(block.items)
+            block = block.prev
+        return block, len(block.items) - index
+
+    def get(self, index: int) -> Any:
+        if not 0 <= index < self.length:
+            raise IndexError("UnrolledLinkedList index out of range")
+        block, i = self._locate(index)
+        return block.items[i]
+
+    def insert(self, index: int, value: Any) -> None:
+        """
+        Like list.insert: an index past either end inserts at that end.
+        """
+        block, i = self._locate(min(max(index, 0), self.length))
+        block.items.insert(i, value)
+        self.length += 1
+        if len(block.items) > self.block_size:
+            self._split(block)
+
+    def append(self, value: Any) -> None:
+        self.tail.items.append(value)
+        self.length += 1
+        if len(self.tail.items) > self.block_size:
+            self._split(self.tail)
+
+    def prepend(self, value: Any) -> None:
+        self.insert(0, value)
+
+    def remove(self, index: int) -> Any:
+        """
+        Removes and returns the value at `index` (clamped to the list, like `DoublyLinkedList.remove`).
+        Removing from an empty list does nothing.
+        """
+        if self.length == 0:
+            return None
+        block, i = self._locate(min(max(index, 0), self.length - 1))
+        value = block.items.pop(i)
+        self.length -= 1
+        self._merge(block)
+        return value
+
+    def reverse(self) -> "UnrolledLinkedList":
+        """
+        Reverse the order of the blocks, and the values inside each block.
+        Time complexity: O(n)
+        """
+        block = self.head
+        while block is not None:
+            block.items.reverse()
+            block.next, block.prev = block.prev, block.next
+            block = block.prev
+        self.head, self.tail = self.tail, self.head
+        return self
+
+    def _split(self, block: _Block) -> None:
+        mid = len(block.items) // 2
+        new = _Block(block.items[mid:])
+        del block.items[mid:]
+        new.prev, new.next = block, block.next
+        if block.next is None:
+            self.tail = new
+        else:
+            block.next.prev = new
+        block.next = new
+
+    def _merge(self, block: _Block) -> None:
+        """
+        Fold `block` into a neighbour if the two fit in half a block (or if it's empty).
+        """
+        for left, right in ((block.prev, block), (block, block.next)):
+            if left is not None and right is not None:
+                if (
+                    not block.items
+                    or len(left.items) + len(right.items) <= self.block_size // 2
+                ):
+                    left.items.extend(right.items)
+                    left.next = right.next
+                    if right.next is None:
+                        self.tail = left
+                    else:
+                        right.next.prev = left
+                    return
+
+
+class LRUCache:
+    """
+    A least-recently-used cache built from a hash table and a doubly linked list.
+
+      _table: key -> Node                  (find any entry in O(1))
+      _list:  most recent <--> ... <--> least recent <--> sentinel
+
+    Every `get`/`put` moves the entry's node to the front of the list. When the cache is
+    full, we evict from the back (just before the sentinel). Because the table hands us the
+    node directly, `move_to_front` and `remove_node` are both O(1).
+
+    The sentinel is there because `DoublyLinkedList` is created with one value.
+    It stays at the tail forever.
+
+    Limits (any combination):
+      max_entries  evict once there are more entries than this
+      max_bytes    evict once the sum of `sizeof(value)` goes over this
+      ttl          seconds before an entry expires (can be overridden per `put`)
+
+    Each node holds a (key, value, expires_at, nbytes) tuple.
+    """
+
+    _SENTINEL = object()
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_bytes: int = None,
+        ttl: float = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._clock = clock
+        self._table = OpenAddressingHashTable()
+        self._list = DoublyLinkedList(self._SENTINEL, NodePool())
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self),
+            "bytes": self._bytes,
+        }
+
+    def _drop(self, node: Node) -> None:
+        key, _, _, nbytes = node.value
+        self._list.remove_node(node)
+        self._table.delete(key)
+        self._bytes -= nbytes
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Time complexity: O(1)
+        """
+        node = self._table.get(key)
+        if node is None:
+            self.misses += 1
+            return default
+        _, value, expires_at, _ = node.value
+        if expires_at is not None and expires_at <= self._clock():
+            self._drop(node)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._list.move_to_front(node)
+        return value
+
+    def put(self, key: Any, value: Any, ttl: float = None) -> None:
+        """
+        Time complexity: O(1) amortized (each entry can only be evicted once)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self._clock() + ttl
+        nbytes = self._sizeof(value) if self.max_bytes is not None else 0
+        node = self._table.get(key)
+        if node is None:
+            self._table.set(key, self._list.prepend((key, value, expires_at, nbytes)))
+        else:
+            self._bytes -= node.value[3]
+            node.value = (key, value, expires_at, nbytes)
+            self._list.move_to_front(node)
+        self._bytes += nbytes
+        # Evict from the back until we're within both limits
+        while len(self) and (
+            (self.max_entries is not None and len(self) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._drop(self._list.tail.prev)
+            self.evictions += 1
+
+    def delete(self, key: Any) -> None:
+        node = self._table.get(key)
+        if node is not None:
+            self._drop(node)
+
+
+def measure_node_memory(n: int = 100_000) -> None:
+    """
+    Print bytes allocated per element of a DoublyLinkedList, and compare with a
+    node class that has a regular __dict__ (which is what Node used to be).
+    """
+
+    class DictNode:
+        def __init__(self, value: Any) -> None:
+            self.value = value
+            self.next = None
+            self.prev = None
+
+    for name, node_class in (("__dict__ node", DictNode), ("__slots__ node", Node)):
+        values = list(range(n))  # allocated up front, so they're not measured
+        tracemalloc.start()
+        head = tail = node_class(None)
+        for v in values:
+            new = node_class(v)
+            new.prev, tail.next, tail = tail, new, new
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>16}: {size / n:6.1f} bytes/element (n={n})")
+
+
+def benchmark_positional_access(n: int = 1_000_000, ops: int = 200) -> None:
+    """
+    `ops` random positional get/insert/remove calls on lists of `n` values.
+    """
+    rng = random.Random(0)
+    indices = [rng.randrange(n // 4, 3 * n // 4) for _ in range(ops)]
+    for name, cls in (
+        ("DoublyLinkedList", DoublyLinkedList),
+        ("UnrolledLinkedList", UnrolledLinkedList),
+    ):
+        lst = cls(0)
+        for i in range(1, n):
+            lst.append(i)
+        get = lst._traverse_to_index if cls is DoublyLinkedList else lst.get
+        start = time.perf_counter()
+        for i in indices:
+            get(i)
+            lst.insert(i, -1)
+            lst.remove(i)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>20}: {elapsed / ops * 1e6:10.1f} us per get+insert+remove (n={n})"
+        )
+
+
+def benchmark_lru_cache(n: int = 200_000, capacity: int = 10_000) -> None:
+    """
+    Read-through workload over random keys from 2x `capacity` distinct keys.
+    Run with `python -m section_08_linked_lists.main --benchmark`
+    """
+    cache = LRUCache(max_entries=capacity)
+    keys = [random.randrange(2 * capacity) for _ in range(n)]
+    start = time.perf_counter()
+    for i, key in enumerate(keys):
+        if cache.get(key) is None:
+            cache.put(key, i)
+    elapsed = time.perf_counter() - start
+    print(f"LRUCache: {n / elapsed:,.0f} ops/sec, {cache.stats}")
+
+
 def main():
     # fmt: off
     my_list = DoublyLinkedList(10) # 10
@@ -239,6 +794,119 @@ def main():
     assert len(my_list) == 5
     print(my_list)
 
+    now = [0.0]
+    cache = LRUCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    cache.put("d", 4, ttl=1)
+    now[0] = 5.0
+    assert cache.get("d") is None and cache.get("c") == 3
+    now[0] = 20.0
+    assert cache.get("c") is None and len(cache) == 0
+    assert cache.stats["evictions"] == 2 and cache.stats["expirations"] == 2
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put("x", "12345")
+    cache.put("y", "123456")
+    assert cache.get("x") is None and cache.get("y") == "123456"
+    cache.delete("y")
+    assert len(cache) == 0 and cache.stats["bytes"] == 0
+    pool = NodePool(max_size=2)
+    pooled = DoublyLinkedList(1, pool)
+    for v in (2, 3, 4):
+        pooled.append(v)
+    pooled.remove(3)  # tail
+    pooled.remove(0)  # head
+    assert len(pool) == 2 and str(pooled) == "2 <--> 3" and pooled.tail.value == 3
+    flipped = DoublyLinkedList(1)
+    flipped.append(2)
+    flipped.append(3)
+    flipped.reverse()
+    assert list(reversed(flipped)) == [1, 2, 3] and flipped.head.prev is None
+    flipped.remove(0)
+    assert list(flipped) == [2, 1] and len(flipped) == 2
+    assert list(reversed(flipped)) == [1, 2]
+    single = DoublyLinkedList("only")
+    single.remove(0)
+    single.remove(0)  # already empty, nothing to do
+    assert len(single) == 0 and single.head is None and single.tail is None
+    single.append("again")
+    assert str(single) == "again" and single.head is single.tail
+    recycled = pool._free[-1]
+    pooled.append(5)  # reuses a removed node instead of allocating
+    assert pooled.tail is recycled and str(pooled) == "2 <--> 3 <--> 5"
+    handles = DoublyLinkedList("b")
+    a = handles.prepend("a")
+    d = handles.append("d")
+    c = handles.insert_before(d, "c")
+    handles.insert_after(d, "e")
+    assert list(handles) == ["a", "b", "c", "d", "e"]
+    handles.move_to_front(d)
+    assert handles.remove_node(c) == "c" and handles.remove_node(a) == "a"
+    assert list(handles) == ["d", "b", "e"] and list(reversed(handles)) == [
+        "e",
+        "b",
+        "d",
+    ]
+    for node in (handles.head, handles.head, handles.head):
+        handles.remove_node(node)
+    assert len(handles) == 0 and handles.head is None and handles.tail is None
+    handles.append("z")
+    assert str(handles) == "z" and handles.head is handles.tail
+    joined = DoublyLinkedList(1)
+    joined.extend([2, 3])
+    other = DoublyLinkedList(4)
+    other.extend(range(5, 7))
+    joined.concat(other)
+    assert list(joined) == [1, 2, 3, 4, 5, 6] and len(other) == 0 and other.head is None
+    middle = DoublyLinkedList("a")
+    middle.append("b")
+    joined.splice(2, middle)
+    assert list(joined) == [1, 2, "a", "b", 3, 4, 5, 6] and len(joined) == 8
+    tail = joined.split_at(3)
+    assert list(joined) == [1, 2, "a"] and list(tail) == ["b", 3, 4, 5, 6]
+    assert list(reversed(joined)) == ["a", 2, 1] and list(reversed(tail)) == [
+        6,
+        5,
+        4,
+        3,
+        "b",
+    ]
+    assert len(joined) == 3 and len(tail) == 5
+    rest = joined.split_at(0)
+    assert len(joined) == 0 and list(rest) == [1, 2, "a"]
+    joined.splice(0, rest).extend([])
+    joined.splice(99, tail)
+    assert str(joined) == "1 <--> 2 <--> a <--> b <--> 3 <--> 4 <--> 5 <--> 6"
+    assert list(reversed(joined))[0] == 6 and len(joined.split_at(8)) == 0
+
+    unrolled = UnrolledLinkedList(0, block_size=4)
+    expected = [0]
+    for i in range(1, 50):
+        unrolled.append(i)
+        expected.append(i)
+    unrolled.prepend(-1)
+    expected.insert(0, -1)
+    for i in (3, 17, 50, 0, 999):
+        unrolled.insert(i, f"x{i}")
+        expected.insert(i, f"x{i}")
+    for i in (5, 0, 100, 20, 20, 20, 20, 20):
+        assert unrolled.remove(i) == expected.pop(min(i, len(expected) - 1))
+    assert list(unrolled) == expected and len(unrolled) == len(expected)
+    assert [unrolled[i] for i in range(len(expected))] == expected
+    assert list(unrolled.reverse()) == expected[::-1]
+    single = UnrolledLinkedList("a")
+    assert str(single) == "a"
+    assert single.remove(0) == "a" and single.remove(0) is None  # already empty
+    single.append("b")
+    assert list(single) == ["b"] and len(single) == 1
+    if "--benchmark" in sys.argv:
+        benchmark_positional_access()
+        measure_node_memory()
+        benchmark_lru_cache()
+
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,16 @@
+import asyncio
+import collections
 import logging
+import multiprocessing
 import os
-from typing import Any
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from multiprocessing import shared_memory
+from queue import Full
+from typing import Any, Callable, Iterable, Iterator, List, Sequence
 
 LOGLEVEL = os.getenv("LOGLEVEL", "INFO").upper()
 logging.basicConfig(level=LOGLEVEL)
@@ -88,7 +98,7 @@ class StackBuiltWithArray:
         return self._data[-1]
 
     def push(self, value: Any) -> None:
-        logging.debug(f"[push] Pushing {value} onto the stack.")
+        logging.debug("[push] Pushing %s onto the stack.", value)
         self._data.append(value)
 
     def pop(self) -> Any:
@@ -96,11 +106,140 @@ class StackBuiltWithArray:
             return None
         value = self._data.pop()
         logging.debug(
-            f"[pop] Popped {value} from the stack. Length is now {len(self._data)}."
+            "[pop] Popped %s from the stack. Length is now %d.", value, len(self._data)
         )
         return value
 
 
+class MinMaxStack(StackBuiltWithArray):
+    """
+    A stack that can also tell you its smallest and largest value in O(1).
+
+    Next to the main stack, we keep a stack of "minimums so far" and one of "maximums so far".
+    A value is pushed onto the min stack only if it's <= the current min (ditto for max),
+    and popped from it when it leaves the main stack. So the top of the min stack is always
+    the min of everything currently in the main stack.
+
+      push 5, 3, 7, 3     main: 5 3 7 3     mins: 5 3 3     maxes: 5 7
+      pop  -> 3           main: 5 3 7       mins: 5 3       maxes: 5 7
+      pop  -> 7           main: 5 3         mins: 5 3       maxes: 5
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._mins = StackBuiltWithArray()
+        self._maxes = StackBuiltWithArray()
+
+    def push(self, value: Any) -> None:
+        super().push(value)
+        if self._mins.empty or value <= self._mins.peek():
+            self._mins.push(value)
+        if self._maxes.empty or value >= self._maxes.peek():
+            self._maxes.push(value)
+
+    def pop(self) -> Any:
+        if self.empty:
+            return None
+        value = super().pop()
+        if value == self._mins.peek():
+            self._mins.pop()
+        if value == self._maxes.peek():
+            self._maxes.pop()
+        return value
+
+    def peek_min(self) -> Any:
+        return self._mins.peek()
+
+    def peek_max(self) -> Any:
+        return self._maxes.peek()
+
+
+class MonotonicWindow:
+    """
+    Max (or min) of the last `size` values pushed, in amortized O(1) per value.
+
+    We keep a deque of (index, value) whose values are always decreasing (for max).
+    When a new value arrives, every smaller value at the back can never be the max again
+    (the new value is bigger *and* will stay in the window longer), so we pop them.
+    Then the front of the deque is the max, unless it has slid out of the window.
+    Each value is appended and popped at most once, hence amortized O(1).
+
+      size 3, push 1 3 2 5 4:
+        1 -> [1]        max 1
+        3 -> [3]        max 3  (1 can never be the max again)
+        2 -> [3 2]      max 3
+        5 -> [5]        max 5
+        4 -> [5 4]      max 5
+    """
+
+    def __init__(self, size: int, mode: str = "max") -> None:
+        assert size > 0 and mode in ("max", "min")
+        self.size = size
+        self.mode = mode
+        self._deque = collections.deque()
+        self._index = 0
+
+    def push(self, value: Any) -> Any:
+        """
+        Adds `value` and returns the max/min of the current window.
+        """
+        window = self._deque
+        if self.mode == "max":
+            while window and window[-1][1] <= value:
+                window.pop()
+        else:
+            while window and window[-1][1] >= value:
+                window.pop()
+        window.append((self._index, value))
+        if window[0][0] <= self._index - self.size:
+            window.popleft()
+        self._index += 1
+        return window[0][1]
+
+
+def sliding_window(
+    values: Iterable[Any], size: int, mode: str = "max"
+) -> Iterator[Any]:
+    """
+    Yields the max/min of every full window of `size` consecutive values of a stream.
+
+    list(sliding_window([1, 3, 2, 5, 4], 3))
+    => [3, 5, 5]
+    """
+    window = MonotonicWindow(size, mode)
+    for i, value in enumerate(values):
+        aggregate = window.push(value)
+        if i >= size - 1:
+            yield aggregate
+
+
+def sliding_window_batch(
+    values: Sequence[Any], size: int, mode: str = "max"
+) -> List[Any]:
+    """
+    Same as `list(sliding_window(values, size, mode))`, for a whole array at once.
+    The deque holds indices only and the loop is inlined, which avoids the method call
+    and tuple per value (about 1.5x faster than the streaming version on 1M floats).
+    """
+    out = []
+    window = collections.deque()
+    larger = mode == "max"
+    for i in range(len(values)):
+        value = values[i]
+        if larger:
+            while window and values[window[-1]] <= value:
+                window.pop()
+        else:
+            while window and values[window[-1]] >= value:
+                window.pop()
+        window.append(i)
+        if window[0] <= i - size:
+            window.popleft()
+        if i >= size - 1:
+            out.append(values[window[0]])
+    return out
+
+
 class QueueBuiltWithLinkedList:
     """
     An implementation of a queue using a singly linked list
@@ -121,7 +260,10 @@ class QueueBuiltWithLinkedList:
         return self._first.value
 
     def enqueue(self, value: Any) -> None:
-        logging.debug(f"[enqueue] {value}, length {self._length} -> {self._length + 1}")
+        # %-style args are only formatted if debug logging is actually enabled
+        logging.debug(
+            "[enqueue] %s, length %d -> %d", value, self._length, self._length + 1
+        )
         new_node = Node(value)
         if self.empty:
             self._first = new_node
@@ -141,17 +283,617 @@ class QueueBuiltWithLinkedList:
         old_first = self._first
         new_first = self._first.next
         logging.debug(
-            f"[dequeue] {old_first} length {self._length} -> {self._length - 1}, "
-            f"first {old_first} -> {new_first}"
+            "[dequeue] %s length %d -> %d, first %s -> %s",
+            old_first,
+            self._length,
+            self._length - 1,
+            old_first,
+            new_first,
         )
         self._first = new_first
         self._length -= 1
         return old_first.value
 
 
-class QueueBuiltWithStacks:
+class RingBufferQueue:
+    """
+    A queue stored in a fixed-size list used as a circle ("ring buffer").
+
+    We keep the index of the first item (`_head`) and the number of items. The next
+    free slot is (head + length) % capacity, so when we reach the end of the list we wrap
+    around to the start. Nothing is allocated per item, and nothing ever shifts.
+
+        capacity 8, head 6, length 4:   [c d _ _ _ _ a b]
+                                             ^tail     ^head
+
+    What happens when it's full depends on `on_full`:
+      "block"      enqueue waits until a consumer makes room (raises queue.Full on timeout).
+                   This is the usual "backpressure" between pipeline stages.
+      "overwrite"  drop the oldest item to make room.
+      "grow"       double the capacity.
+
+    It's thread-safe: a producer and a consumer can share it. `dequeue` returns None when
+    empty, unless block=True, in which case it waits for an item (or the timeout).
+    """
+
+    ON_FULL = ("block", "overwrite", "grow")
+
+    def __init__(self, capacity: int = 1024, on_full: str = "block") -> None:
+        assert capacity > 0 and on_full in self.ON_FULL
+        self._data = [None] * capacity
+        self._head = 0
+        self._length = 0
+        self._on_full = on_full
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    @property
+    def empty(self) -> bool:
+        return self._length == 0
+
+    @property
+    def full(self) -> bool:
+        return self._length == len(self._data)
+
+    def peek(self) -> Any:
+        with self._lock:
+            return None if self._length == 0 else self._data[self._head]
+
+    def _wait_for_room(self, timeout: float = None) -> None:
+        """
+        Called with the lock held when the buffer is full. Makes room for at least one item.
+        """
+        if self._on_full == "grow":
+            capacity = len(self._data)
+            # unroll the circle so the items start at 0, then add the new space at the end
+            self._data = (
+                self._data[self._head :] + self._data[: self._head] + [None] * capacity
+            )
+            self._head = 0
+        elif self._on_full == "overwrite":
+            self._data[self._head] = None
+            self._head = (self._head + 1) % len(self._data)
+            self._length -= 1
+        elif not self._not_full.wait_for(lambda: not self.full, timeout):
+            raise Full
+
+    def enqueue(self, value: Any, timeout: float = None) -> None:
+        """
+        Time complexity: O(1) (amortized O(1) when growing)
+        """
+        with self._lock:
+            if self._length == len(self._data):
+                self._wait_for_room(timeout)
+            self._data[(self._head + self._length) % len(self._data)] = value
+            self._length += 1
+            self._not_empty.notify()
+
+    def dequeue(self, block: bool = False, timeout: float = None) -> Any:
+        """
+        Time complexity: O(1)
+        """
+        with self._lock:
+            if self._length == 0 and not (
+                block and self._not_empty.wait_for(lambda: self._length, timeout)
+            ):
+                return None
+            value = self._data[self._head]
+            self._data[self._head] = None  # don't keep a reference to dequeued items
+            self._head = (self._head + 1) % len(self._data)
+            self._length -= 1
+            self._not_full.notify()
+            return value
+
+    def put_many(self, values: Iterable[Any], timeout: float = None) -> int:
+        """
+        Enqueue a batch under one lock acquisition. Items are copied in with (at most two)
+        slice assignments per pass, one up to the end of the list and one after wrapping.
+        With on_full="block", a batch bigger than the free space is written as room appears.
+
+        `timeout` is for the whole batch. If it runs out, the items written so far stay
+        in the queue, and the queue.Full raised has their count in `written`.
+        Returns the number of items written.
+        """
+        values = list(values)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        i = 0
+        with self._lock:
+            while i < len(values):
+                if self._length == len(self._data):
+                    remaining = (
+                        None
+                        if deadline is None
+                        else max(0, deadline - time.monotonic())
+                    )
+                    try:
+                        self._wait_for_room(remaining)
+                    except Full as exc:
+                        exc.written = i
+                        raise
+                capacity = len(self._data)
+                k = min(len(values) - i, capacity - self._length)
+                tail = (self._head + self._length) % capacity
+                first = min(k, capacity - tail)
+                self._data[tail : tail + first] = values[i : i + first]
+                self._data[: k - first] = values[i + first : i + k]
+                self._length += k
+                i += k
+                self._not_empty.notify_all()
+        return i
+
+    def get_many(self, n: int, block: bool = False, timeout: float = None) -> List[Any]:
+        """
+        Dequeue up to `n` items at once (fewer if there aren't that many).
+        With block=True, waits until at least one item is available.
+        """
+        with self._lock:
+            if block:
+                self._not_empty.wait_for(lambda: self._length, timeout)
+            capacity = len(self._data)
+            k = min(n, self._length)
+            first = min(k, capacity - self._head)
+            values = (
+                self._data[self._head : self._head + first] + self._data[: k - first]
+            )
+            self._data[self._head : self._head + first] = [None] * first
+            self._data[: k - first] = [None] * (k - first)
+            self._head = (self._head + k) % capacity
+            self._length -= k
+            self._not_full.notify_all()
+            return values
+
+
+class _AsyncContainer(ABC):
+    """
+    The asyncio plumbing shared by `AsyncQueueBuiltWithLinkedList` and `AsyncStackBuiltWithArray`.
+    Subclasses only say how to store an item (`_push`) and take one out (`_pop`).
+
+    Coroutines that can't make progress (get when empty, put when full) wait on a future
+    in a FIFO line of "getters"/"putters". Whoever changes the size wakes up the next one
+    in line. Everything runs inside one event loop, so no thread locks are needed.
+
+    Cancellation safety: if a waiter is cancelled just after being woken up, it passes
+    the wake-up on to the next waiter instead of swallowing it.
+
+    `task_done`/`join` work like asyncio.Queue: every item put must be marked done
+    before `join` returns.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        self.maxsize = maxsize
+        self._size = 0
+        self._getters = collections.deque()
+        self._putters = collections.deque()
+        self._unfinished_tasks = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def empty(self) -> bool:
+        return self._size == 0
+
+    @property
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._size
+
+    @abstractmethod
+    def _push(self, item: Any) -> None: ...
+
+    @abstractmethod
+    def _pop(self) -> Any: ...
+
+    @staticmethod
+    def _wakeup_next(waiters: collections.deque) -> None:
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    async def _wait(
+        self, waiters: collections.deque, blocked: Callable[[], bool]
+    ) -> None:
+        while blocked():
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                waiter.cancel()
+                try:
+                    waiters.remove(waiter)
+                except ValueError:
+                    pass  # already woken up and removed from the line
+                if not blocked() and not waiter.cancelled():
+                    # we were woken up, but won't use it, so wake up the next one
+                    self._wakeup_next(waiters)
+                raise
+
+    async def put(self, item: Any) -> None:
+        if self.full:
+            await self._wait(self._putters, lambda: self.full)
+        self.put_nowait(item)
+
+    def put_nowait(self, item: Any) -> None:
+        if self.full:
+            raise asyncio.QueueFull
+        self._push(item)
+        self._size += 1
+        self._unfinished_tasks += 1
+        self._finished.clear()
+        self._wakeup_next(self._getters)
+
+    async def get(self) -> Any:
+        if self.empty:
+            await self._wait(self._getters, lambda: self.empty)
+        return self.get_nowait()
+
+    def get_nowait(self) -> Any:
+        if self.empty:
+            raise asyncio.QueueEmpty
+        item = self._pop()
+        self._size -= 1
+        self._wakeup_next(self._putters)
+        return item
+
+    def task_done(self) -> None:
+        if self._unfinished_tasks <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished_tasks -= 1
+        if self._unfinished_tasks == 0:
+            self._finished.set()
+
+    async def join(self) -> None:
+        await self._finished.wait()
+
+
+class AsyncQueueBuiltWithLinkedList(_AsyncContainer):
+    """
+    An asyncio FIFO queue stored in a `QueueBuiltWithLinkedList`.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self._queue = QueueBuiltWithLinkedList()
+
+    def _push(self, item: Any) -> None:
+        self._queue.enqueue(item)
+
+    def _pop(self) -> Any:
+        return self._queue.dequeue()
+
+
+class AsyncStackBuiltWithArray(_AsyncContainer):
+    """
+    An asyncio LIFO stack stored in a `StackBuiltWithArray`.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        super().__init__(maxsize)
+        self._stack = StackBuiltWithArray()
+
+    def _push(self, item: Any) -> None:
+        self._stack.push(item)
+
+    def _pop(self) -> Any:
+        return self._stack.pop()
+
+
+async def _fan_out_fan_in(
+    queue: Any, producers: int, consumers: int, items: int
+) -> None:
+    async def produce() -> None:
+        for i in range(items):
+            await queue.put(i)
+
+    async def consume() -> None:
+        while True:
+            await queue.get()
+            queue.task_done()
+
+    workers = [asyncio.create_task(consume()) for _ in range(consumers)]
+    await asyncio.gather(*(produce() for _ in range(producers)))
+    await queue.join()
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+
+def benchmark_async_queues(
+    producers: int = 1000, consumers: int = 1000, items: int = 100
+) -> None:
+    """
+    `producers` coroutines each put `items` items into a bounded queue, which `consumers`
+    coroutines drain. Compared against asyncio.Queue.
+    """
+    for name, factory in (
+        ("asyncio.Queue", lambda: asyncio.Queue(maxsize=100)),
+        ("AsyncQueueBuiltWithLinkedList", lambda: AsyncQueueBuiltWithLinkedList(100)),
+        ("AsyncStackBuiltWithArray", lambda: AsyncStackBuiltWithArray(100)),
+    ):
+
+        async def run() -> None:
+            await _fan_out_fan_in(factory(), producers, consumers, items)
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        print(f"{name:>30}: {producers * items / elapsed:10,.0f} items/sec")
+
+
+class SharedMemoryQueue:
+    """
+    A queue of byte blobs that lives in `multiprocessing.shared_memory`, so processes can
+    pass work items without pickling them through a pipe.
+
+    It's a ring buffer of bytes (like `RingBufferQueue`, but for variable-sized records):
+
+      header   head (u64), tail (u64), capacity (u64), each on its own cache line
+      ring     records: length (u32) + payload, padded to 8 bytes
+
+    `head` and `tail` only ever increase, and position % capacity is the offset in the ring.
+    The producer writes a record, *then* moves `tail` forward. The consumer reads at
+    `head`, then moves `head`. With one producer and one consumer, each counter has a
+    single writer, so no lock is needed (single-producer/single-consumer mode). The one
+    exception is an empty queue: a producer may move `head` up to the start of the ring.
+    With several producers, pass a `multiprocessing.Lock()` which they take while writing.
+    There is always one consumer.
+
+    A record is never split across the end of the ring: if it doesn't fit, we write a
+    "wrap" marker and start again at offset 0. That keeps every payload contiguous, so
+    `dequeue`/`peek` can return a zero-copy `memoryview` straight into shared memory.
+    The view from `dequeue` stays valid until the next `dequeue` (that's when its space is
+    handed back to producers). Copy it (`bytes(view)`) if you need it for longer,
+    and release views before calling `close`.
+
+    Pass `record_size` to only accept records of exactly that many bytes.
+    Pass the queue itself to child processes; they re-attach by name.
+    """
+
+    _HEADER = 192
+    _HEAD, _TAIL, _CAPACITY = 0, 64, 128
+    _U64 = struct.Struct("<Q")
+    _LEN = struct.Struct("<I")
+    _WRAP = 0xFFFFFFFF
+    # Waiting is polling: start by just yielding the CPU, then back off up to this long,
+    # so a blocked producer/consumer doesn't keep a core busy.
+    _MAX_BACKOFF = 1e-3
+
+    def __init__(
+        self,
+        capacity: int = 1 << 20,
+        record_size: int = None,
+        lock: Any = None,
+        name: str = None,
+    ) -> None:
+        self.record_size = record_size
+        self._lock = lock
+        # bytes of the last dequeued record, released on the next dequeue
+        self._pending = 0
+        if name is None:
+            capacity = (capacity + 7) // 8 * 8
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=self._HEADER + capacity
+            )
+            self._shm.buf[: self._HEADER] = bytes(self._HEADER)
+            self._U64.pack_into(self._shm.buf, self._CAPACITY, capacity)
+            # a pid rather than a flag, since forked children get a copy of this object
+            self._owner_pid = os.getpid()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner_pid = None
+        self._buf = self._shm.buf
+        self._capacity = self._U64.unpack_from(self._buf, self._CAPACITY)[0]
+
+    def __reduce__(self):
+        # Sending the queue to another process re-attaches to the same shared memory
+        return (
+            self.__class__,
+            (self._capacity, self.record_size, self._lock, self._shm.name),
+        )
+
+    def __enter__(self) -> "SharedMemoryQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Detach from the shared memory. The process that created the queue also frees it.
+        """
+        self._buf.release()
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
+
+    def _get(self, offset: int) -> int:
+        return self._U64.unpack_from(self._buf, offset)[0]
+
+    def _set(self, offset: int, value: int) -> None:
+        self._U64.pack_into(self._buf, offset, value)
+
+    @property
+    def empty(self) -> bool:
+        return self._next() is None
+
+    def _try_enqueue(self, data: bytes) -> bool:
+        capacity, ring = self._capacity, self._HEADER
+        size = (self._LEN.size + len(data) + 7) // 8 * 8
+        head = self._get(self._HEAD)
+        tail = self._get(self._TAIL)
+        if head == tail and tail % capacity + size > capacity:
+            # Nothing is queued (and the consumer isn't holding a record), so instead of
+            # wrapping, move the head to the start of the ring: an empty queue must take any
+            # record that fits. Until the tail catches up, the consumer sees tail < head = empty.
+            head = tail = tail + capacity - tail % capacity
+            self._set(self._HEAD, head)
+        offset = tail % capacity
+        padding = capacity - offset if offset + size > capacity else 0
+        if capacity - (tail - head) < padding + size:
+            return False
+        if padding:
+            self._LEN.pack_into(self._buf, ring + offset, self._WRAP)
+            offset = 0
+        self._LEN.pack_into(self._buf, ring + offset, len(data))
+        start = ring + offset + self._LEN.size
+        self._buf[start : start + len(data)] = data
+        # publish after the data is written
+        self._set(self._TAIL, tail + padding + size)
+        return True
+
+    def enqueue(self, data: bytes, timeout: float = None) -> None:
+        """
+        Copies `data` into the ring. If there is no room, waits for the consumer
+        (raises queue.Full after `timeout` seconds).
+        """
+        if self.record_size is not None and len(data) != self.record_size:
+            raise ValueError(
+                f"Expected a {self.record_size} byte record, got {len(data)}"
+            )
+        if self._LEN.size + len(data) > self._capacity:
+            raise ValueError("Record is larger than the queue")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.0
+        while True:
+            if self._lock is None:
+                done = self._try_enqueue(data)
+            else:
+                with self._lock:
+                    done = self._try_enqueue(data)
+            if done:
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                raise Full
+            delay = self._backoff(delay)
+
+    @classmethod
+    def _backoff(cls, delay: float) -> float:
+        """
+        Sleeps for `delay` seconds and returns the next delay (doubled, at most `_MAX_BACKOFF`).
+        """
+        time.sleep(delay)
+        return min(max(delay * 2, 1e-6), cls._MAX_BACKOFF)
+
+    def _next(self) -> tuple:
+        """
+        Finds the next record after the one we're holding on to (`_pending`), without
+        moving `head`. Returns (view, bytes it takes up, including any wrap), or None.
+        """
+        # tail first: a producer may move the head of an empty queue forward (see _try_enqueue)
+        tail = self._get(self._TAIL)
+        head = self._get(self._HEAD) + self._pending
+        if head >= tail:
+            return None
+        offset = head % self._capacity
+        length = self._LEN.unpack_from(self._buf, self._HEADER + offset)[0]
+        skipped = 0
+        if length == self._WRAP:
+            # skip the unused space at the end of the ring
+            skipped = self._capacity - offset
+            offset = 0
+            length = self._LEN.unpack_from(self._buf, self._HEADER)[0]
+        start = self._HEADER + offset + self._LEN.size
+        size = (self._LEN.size + length + 7) // 8 * 8
+        return self._buf[start : start + length], skipped + size
+
+    def peek(self) -> memoryview:
+        """
+        A zero-copy view of the next record (without removing it), or None if empty.
+        Doesn't hand back the space of the last dequeued record, so its view stays valid.
+        """
+        found = self._next()
+        return None if found is None else found[0]
+
+    def dequeue(self, block: bool = False, timeout: float = None) -> memoryview:
+        """
+        Returns a zero-copy view of the next record, or None if the queue is empty
+        (with block=True, waits up to `timeout` seconds for one).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._release_pending()
+        found = self._next()
+        delay = 0.0
+        while found is None and block:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            delay = self._backoff(delay)
+            found = self._next()
+        if found is None:
+            return None
+        view, self._pending = found
+        return view
+
+    def _release_pending(self) -> None:
+        if self._pending:
+            self._set(self._HEAD, self._get(self._HEAD) + self._pending)
+            self._pending = 0
+
+
+def _shared_memory_producer(
+    queue: SharedMemoryQueue, items: int, payload: bytes
+) -> None:
+    for _ in range(items):
+        queue.enqueue(payload)
+    queue.enqueue(b"")  # empty record means "done"
+    queue.close()
+
+
+def _pipe_producer(queue: Any, items: int, payload: bytes) -> None:
+    for _ in range(items):
+        queue.put(payload)
+    queue.put(b"")
+
+
+def benchmark_shared_memory_queue(items: int = 200_000, size: int = 256) -> None:
+    """
+    One producer process sends `items` blobs of `size` bytes to this process.
+    """
+    payload = bytes(size)
+    with SharedMemoryQueue(capacity=1 << 20) as shm_queue:
+        start = time.perf_counter()
+        producer = multiprocessing.Process(
+            target=_shared_memory_producer, args=(shm_queue, items, payload)
+        )
+        producer.start()
+        while len(shm_queue.dequeue(block=True)):
+            pass
+        elapsed = time.perf_counter() - start
+        producer.join()
+    print(
+        f"{'SharedMemoryQueue':>24}: {items / elapsed:10,.0f} items/sec ({size} bytes)"
+    )
+    pipe_queue = multiprocessing.Queue(maxsize=10_000)
+    start = time.perf_counter()
+    producer = multiprocessing.Process(
+        target=_pipe_producer, args=(pipe_queue, items, payload)
+    )
+    producer.start()
+    while len(pipe_queue.get()):
+        pass
+    elapsed = time.perf_counter() - start
+    producer.join()
+    print(
+        f"{'multiprocessing.Queue':>24}: {items / elapsed:10,.0f} items/sec ({size} bytes)"
+    )
+
+
+class QueueBuiltWithStacksNaive:
     """
-    An implementation of a queue using stacks.
+    An implementation of a queue using stacks (the version from the lecture).
+    Every enqueue/dequeue moves *everything* to the other stack, so alternating between
+    them is O(n) per operation. See `QueueBuiltWithStacks` for the amortized O(1) version.
 
     The idea here is to keep two stacks. One is for pushing items, and one is for popping items.
     But before we do any push/pop operation, we move all the items to that stack so that the
@@ -214,6 +956,82 @@ class QueueBuiltWithStacks:
         return self._front.pop()
 
 
+class QueueBuiltWithStacks:
+    """
+    An implementation of a queue using two stacks, with amortized O(1) enqueue/dequeue.
+
+    New items are always pushed onto the "inbox". Items are always popped from the "outbox".
+
+                    inbox    outbox
+      push here >>   ---yx| |-----  >> pop from here
+
+    Only when the outbox is empty do we move the whole inbox over (which reverses it,
+    so the oldest item ends up on top):
+
+                    inbox    outbox
+                     -----| |yx---
+
+    Unlike `QueueBuiltWithStacksNaive`, we never move items back. Each item is pushed and
+    popped at most twice in its lifetime (once per stack), so n operations cost O(n) total,
+    even when enqueue/dequeue alternate.
+    """
+
+    def __init__(self) -> None:
+        self._inbox = []
+        self._outbox = []
+
+    @property
+    def empty(self) -> bool:
+        return not self._inbox and not self._outbox
+
+    def peek(self) -> Any:
+        if self._outbox:
+            return self._outbox[-1]
+        elif self._inbox:
+            return self._inbox[0]
+        return None
+
+    def enqueue(self, value: Any) -> None:
+        """
+        Time complexity: O(1)
+        """
+        self._inbox.append(value)
+
+    def dequeue(self) -> Any:
+        """
+        Time complexity: O(1) amortized (O(n) only when the outbox has to be refilled)
+        """
+        if not self._outbox:
+            if not self._inbox:
+                return None
+            self._inbox.reverse()
+            self._inbox, self._outbox = self._outbox, self._inbox
+        return self._outbox.pop()
+
+
+def benchmark_interleaved_queues(ops: int = 2_000) -> None:
+    """
+    Producer/consumer pattern: with a backlog of `backlog` items already queued,
+    alternate enqueue and dequeue `ops` times. The naive queue's time per op grows with
+    the backlog (quadratic overall), the lazy one stays flat (linear overall).
+    Run with `python -m section_09_stacks_and_queues.main --benchmark`
+    """
+    for backlog in (1_000, 2_000, 4_000, 8_000):
+        timings = []
+        for cls in (QueueBuiltWithStacksNaive, QueueBuiltWithStacks):
+            queue = cls()
+            for i in range(backlog):
+                queue.enqueue(i)
+            start = time.perf_counter()
+            for i in range(ops):
+                queue.enqueue(i)
+                queue.dequeue()
+            timings.append((time.perf_counter() - start) / ops * 1e6)
+        print(
+            f"backlog {backlog:>5}: naive {timings[0]:8.2f} us/op, lazy {timings[1]:6.2f} us/op"
+        )
+
+
 def main():
     stack1 = StackBuiltWithLinkedList()
     stack2 = StackBuiltWithArray()
@@ -229,9 +1047,26 @@ def main():
         assert stack.empty
         assert stack.pop() is None
 
+    stack = MinMaxStack()
+    assert stack.peek_min() is None and stack.peek_max() is None
+    for v in (5, 3, 7, 3):
+        stack.push(v)
+    assert (stack.peek_min(), stack.peek_max()) == (3, 7)
+    assert stack.pop() == 3 and (stack.peek_min(), stack.peek_max()) == (3, 7)
+    assert stack.pop() == 7 and (stack.peek_min(), stack.peek_max()) == (3, 5)
+    assert stack.pop() == 3 and (stack.peek_min(), stack.peek_max()) == (5, 5)
+
+    values = [4, 2, 12, 3, 8, 8, 1, 9, 9, 0]
+    for size in (1, 3, 10):
+        for mode, fn in (("max", max), ("min", min)):
+            expected = [fn(values[i : i + size]) for i in range(len(values) - size + 1)]
+            assert list(sliding_window(iter(values), size, mode)) == expected
+            assert sliding_window_batch(values, size, mode) == expected
+
     queue1 = QueueBuiltWithLinkedList()
     queue2 = QueueBuiltWithStacks()
-    for queue in (queue1, queue2):
+    queue3 = QueueBuiltWithStacksNaive()
+    for queue in (queue1, queue2, queue3):
         assert queue.empty
         assert queue.peek() is None
         queue.enqueue("Joy")
@@ -248,6 +1083,158 @@ def main():
         assert queue.dequeue() == "Samir"
         assert queue.empty
 
+    # interleaved enqueue/dequeue keeps FIFO order
+    queue = QueueBuiltWithStacks()
+    out = []
+    for i in range(10):
+        queue.enqueue(i)
+        queue.enqueue(i + 100)
+        out.append(queue.dequeue())
+        assert queue.peek() is not None
+    while not queue.empty:
+        out.append(queue.dequeue())
+    assert out == [v for i in range(10) for v in (i, i + 100)]
+    assert queue.dequeue() is None and queue.peek() is None
+
+    ring = RingBufferQueue(4, on_full="overwrite")
+    ring.put_many(range(6))
+    assert len(ring) == 4 and ring.peek() == 2
+    assert ring.get_many(3) == [2, 3, 4]
+    ring.put_many("abc")  # wraps around the end of the list
+    assert ring.full and ring.get_many(10) == [5, "a", "b", "c"]
+    assert ring.dequeue() is None and ring.empty
+    ring = RingBufferQueue(2, on_full="grow")
+    ring.put_many(range(5))
+    ring.enqueue(5)
+    assert ring.capacity == 8 and ring.get_many(10) == [0, 1, 2, 3, 4, 5]
+    ring = RingBufferQueue(2, on_full="block")
+    ring.enqueue(1)
+    ring.enqueue(2)
+    try:
+        ring.enqueue(3, timeout=0.01)
+        assert False, "expected queue.Full"
+    except Full:
+        pass
+    try:
+        ring.put_many("abc", timeout=0.01)
+        assert False, "expected queue.Full"
+    except Full as exc:
+        assert exc.written == 0
+    # the timeout covers the whole batch, not each wait for room
+    ring = RingBufferQueue(4)
+
+    def slow_consumer() -> None:
+        for _ in range(10):
+            time.sleep(0.02)
+            ring.dequeue()
+
+    consumer = threading.Thread(target=slow_consumer)
+    consumer.start()
+    start = time.monotonic()
+    try:
+        ring.put_many(range(100), timeout=0.1)
+        assert False, "expected queue.Full"
+    except Full as exc:
+        assert time.monotonic() - start < 0.2 and 4 <= exc.written <= 9
+    consumer.join()
+    ring.get_many(4)
+    assert ring.put_many([1]) == 1
+    # a producer thread is held back by a slower consumer, nothing is lost
+    ring = RingBufferQueue(8)
+    producer = threading.Thread(target=lambda: ring.put_many(range(1000)))
+    producer.start()
+    received = []
+    while len(received) < 1000:
+        received.extend(ring.get_many(3, block=True))
+    producer.join()
+    assert received == list(range(1000))
+
+    async def check_async() -> None:
+        aqueue = AsyncQueueBuiltWithLinkedList(maxsize=2)
+        astack = AsyncStackBuiltWithArray()
+        for v in ("a", None, "c"):
+            astack.put_nowait(v)
+        assert [await astack.get() for _ in range(3)] == ["c", None, "a"]
+        # get waits for a put
+        getter = asyncio.create_task(aqueue.get())
+        await asyncio.sleep(0)
+        await aqueue.put("x")
+        assert await getter == "x"
+        # put waits while full, and a cancelled putter doesn't lose a wake-up
+        aqueue.put_nowait(1)
+        aqueue.put_nowait(2)
+        cancelled = asyncio.create_task(aqueue.put("cancelled"))
+        waiting = asyncio.create_task(aqueue.put(3))
+        await asyncio.sleep(0)
+        assert aqueue.full and aqueue.get_nowait() == 1
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        await waiting
+        assert [aqueue.get_nowait(), aqueue.get_nowait()] == [2, 3]
+        for _ in range(4):
+            aqueue.task_done()
+        await asyncio.wait_for(aqueue.join(), 1)
+        await _fan_out_fan_in(AsyncQueueBuiltWithLinkedList(5), 20, 5, 10)
+
+    asyncio.run(check_async())
+    try:
+        _AsyncContainer()  # no _push/_pop to store items with
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+
+    with SharedMemoryQueue(capacity=64) as shm_queue:
+        assert shm_queue.empty and shm_queue.dequeue() is None
+        for i in range(20):  # 20 x 24 byte records, wrapping around the 64 byte ring
+            shm_queue.enqueue(f"record-{i:02}".encode() * 2)
+            view = shm_queue.dequeue()
+            assert bytes(view) == f"record-{i:02}".encode() * 2
+            view.release()
+        try:
+            for _ in range(5):
+                shm_queue.enqueue(b"x" * 20, timeout=0.01)
+            assert False, "expected queue.Full"
+        except Full:
+            pass
+        assert bytes(shm_queue.peek()) == b"x" * 20
+    with SharedMemoryQueue(capacity=64) as shm_queue:
+        shm_queue.enqueue(b"a" * 20)
+        view = shm_queue.dequeue()
+        assert shm_queue.peek() is None and bytes(view) == b"a" * 20
+        view.release()
+        assert shm_queue.dequeue() is None  # hands the record's space back
+        # empty, with the tail mid-ring: the record only fits after wrapping
+        shm_queue.enqueue(b"b" * 40, timeout=0.2)
+        view = shm_queue.dequeue()
+        assert bytes(view) == b"b" * 40 and shm_queue.empty
+        view.release()
+    with SharedMemoryQueue(capacity=256, lock=multiprocessing.Lock()) as shm_queue:
+        producers = [
+            multiprocessing.Process(
+                target=_shared_memory_producer, args=(shm_queue, 100, bytes([p]))
+            )
+            for p in range(3)
+        ]
+        for producer in producers:
+            producer.start()
+        received, done = [], 0
+        while done < 3:
+            record = bytes(shm_queue.dequeue(block=True))
+            if record:
+                received.append(record)
+            else:
+                done += 1
+        for producer in producers:
+            producer.join()
+        assert sorted(received) == sorted(
+            bytes([p]) for p in range(3) for _ in range(100)
+        )
+
+    if "--benchmark" in sys.argv:
+        benchmark_async_queues()
+        benchmark_shared_memory_queue()
+        benchmark_interleaved_queues()
+
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,10 @@
+import heapq
 import logging
 import os
-from typing import Any
+import random
+import sys
+import time
+from typing import Any, Iterable, Iterator, List
 
 LOGLEVEL = os.getenv("LOGLEVEL", "INFO").upper()
 logging.basicConfig(level=LOGLEVEL)
@@ -12,6 +16,8 @@ class Node:
         self.left: Node = None
         self.right: Node = None
         self.parent: Node = None
+        # number of nodes in the subtree rooted here (including this one)
+        self.size = 1
 
     @property
     def nchildren(self) -> int:
@@ -24,18 +30,117 @@ class Node:
         return str(self)
 
     def __eq__(self, node: "Node") -> bool:
-        return self.value == node.value
+        # `successor` compares nodes with missing children (None), so check the type first
+        return isinstance(node, Node) and self.value == node.value
+
+
+def _size(node: Node) -> int:
+    return 0 if node is None else node.size
 
 
 class BinarySearchTree:
     def __init__(self) -> None:
         self._root = None
 
+    def _new_node(self, value: Any) -> Node:
+        return Node(value)
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def _refresh(self, node: Node) -> None:
+        """
+        Recompute what a node caches about its subtree (its size), after its children changed.
+        """
+        node.size = 1 + _size(node.left) + _size(node.right)
+
+    def _refresh_upwards(self, node: Node) -> None:
+        while node is not None:
+            self._refresh(node)
+            node = node.parent
+
+    def _replace_child(self, parent: Node, old: Node, new: Node) -> None:
+        """
+        Put `new` where `old` was under `parent` (or at the root if there's no parent).
+        """
+        if parent is None:
+            self._root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+        if new is not None:
+            new.parent = parent
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        In-order traversal (ie. sorted values), with an explicit stack instead of recursion.
+        Go left as far as possible, then visit the node, then do the same from its right child.
+        Time complexity: O(n) overall, O(height) memory.
+        """
+        stack, node = [], self._root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.value
+            node = node.right
+
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any]) -> "BinarySearchTree":
+        """
+        Build a perfectly balanced tree from sorted values in O(n), instead of n inserts
+        (O(n log n) at best, O(n^2) for sorted input).
+
+        The middle value becomes the root, the middle of the left half becomes its left
+        child, and so on. Each value is visited once. Duplicates are dropped, like `insert` does.
+
+          [1, 2, 3, 4, 5, 6, 7]  ->       4
+                                        /   \\
+                                       2     6
+                                      / \\   / \\
+                                     1   3 5   7
+        """
+        unique: List[Any] = []
+        for value in values:
+            if unique and value <= unique[-1]:
+                if value == unique[-1]:
+                    continue
+                raise ValueError("from_sorted() needs values in ascending order")
+            unique.append(value)
+        tree = cls()
+        tree._root = tree._build(unique, 0, len(unique), None)
+        return tree
+
+    def _build(self, values: List[Any], lo: int, hi: int, parent: Node) -> Node:
+        """
+        Returns the root of a balanced subtree holding values[lo:hi].
+        Recursion depth is only log2(n), since each call halves the range.
+        """
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = self._new_node(values[mid])
+        node.parent = parent
+        node.left = self._build(values, lo, mid, node)
+        node.right = self._build(values, mid + 1, hi, node)
+        self._refresh(node)
+        return node
+
+    def merge(self, other: "BinarySearchTree") -> "BinarySearchTree":
+        """
+        Returns a new balanced tree with the values of both trees, in O(n + m).
+        Both in-order traversals are already sorted, so we merge the two streams
+        (like merge sort's merge step) and feed the result to `from_sorted`.
+        """
+        return self.from_sorted(heapq.merge(self, other))
+
     def insert(self, value: Any) -> None:
         """
         Increasing values go to the right, decreasing values go to the left.
         """
-        new_node = Node(value)
+        new_node = self._new_node(value)
         if self._root is None:
             self._root = new_node
         else:
@@ -56,7 +161,9 @@ class BinarySearchTree:
                     else:
                         curr = curr.left
                 else:
-                    break  # already exists!
+                    return  # already exists!
+            # every node on the way down has one more node in its subtree now
+            self._refresh_upwards(curr)
 
     def lookup(self, value: Any) -> Node:
         if self._root is None:
@@ -142,65 +249,305 @@ class BinarySearchTree:
         node = self.lookup(value)
         if node is None:
             return
+        self._refresh_upwards(self._unlink(node))
+
+    def _unlink(self, node: Node) -> Node:
+        """
+        Takes `node` out of the tree (the 3 cases of `remove`), relinking the successor
+        node rather than copying its value, so other node handles stay valid.
+        Returns the lowest node whose subtree changed: sizes are fixed from there up.
+        """
+        lowest = node.parent
         # If this is a leaf node, just delete it
-        elif node.nchildren == 0:
-            if node == self._root:
-                self._root = None
-            else:
-                if node == node.parent.left:
-                    node.parent.left = None
-                else:
-                    node.parent.right = None
+        if node.nchildren == 0:
+            self._replace_child(node.parent, node, None)
         # If node has 1 child, bypass node and set its child as the child of node.parent
         elif node.nchildren == 1:
             succ = node.right if node.left is None else node.left
-            if node.value < node.parent.value:
-                node.parent.left = succ
-            else:
-                node.parent.right = succ
+            self._replace_child(node.parent, node, succ)
         # Otherwise, replace node with its successor
         else:
+            # node has a right subtree, so the successor is the min of it,
+            # which means it has no left child.
             succ = self.successor(node)
 
+            # Disconnect the successor from its original parent. Its right child
+            # (if any) takes its place. Then it adopts the target node's right subtree.
+            # (If the successor *is* the target's right child, it keeps its right subtree.)
+            if succ is not node.right:
+                lowest = succ.parent
+                self._replace_child(succ.parent, succ, succ.right)
+                succ.right = node.right
+                node.right.parent = succ
+            else:
+                lowest = succ
+
+            # The successor adopts the target node's left subtree
+            succ.left = node.left
+            node.left.parent = succ
+
             # Update the target's parent to point to 'successor' as its child
-            # If no parent exists, this is the root node, so set it to NULL and return, we're done!
-            if node.parent:
-                if node.value < node.parent.value:
-                    node.parent.left = succ
-                else:
-                    node.parent.right = succ
+            # (or make the successor the root)
+            self._replace_child(node.parent, node, succ)
+
+        # Isolate the target node completely
+        node.parent = node.left = node.right = None
+        return lowest
+
+    def select(self, k: int) -> Any:
+        """
+        Returns the k-th smallest value (k=0 is the min).
+        Each node knows the size of its left subtree, so we know if the answer is
+        to the left, right here, or to the right (skipping the left subtree + this node).
+        Time complexity: O(height)
+        """
+        if not 0 <= k < len(self):
+            raise IndexError("select() index out of range")
+        node = self._root
+        while True:
+            left = _size(node.left)
+            if k < left:
+                node = node.left
+            elif k == left:
+                return node.value
+            else:
+                k -= left + 1
+                node = node.right
+
+    def rank(self, value: Any) -> int:
+        """
+        Returns how many values in the tree are smaller than `value`.
+        Every time we go right, the left subtree and the current node are all smaller.
+        Time complexity: O(height)
+        """
+        count, node = 0, self._root
+        while node is not None:
+            if value <= node.value:
+                node = node.left
+            else:
+                count += _size(node.left) + 1
+                node = node.right
+        return count
+
+    def count_range(self, low: Any, high: Any) -> int:
+        """
+        Number of values in [low, high). Time complexity: O(height)
+        """
+        return max(0, self.rank(high) - self.rank(low))
+
+    def range(self, low: Any, high: Any) -> Iterator[Any]:
+        """
+        Lazily yields the values in [low, high) in order.
+
+        Like `__iter__`, but we start by only pushing the nodes >= low on the path from
+        the root (skipping every subtree that's entirely below `low`), and stop at the
+        first value >= high. Time complexity: O(height + number of values yielded)
+        """
+        stack, node = [], self._root
+        while node is not None:
+            if node.value >= low:
+                stack.append(node)
+                node = node.left
             else:
-                self._root = None
+                node = node.right
+        while stack:
+            node = stack.pop()
+            if node.value >= high:
                 return
+            yield node.value
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+
+class AVLNode(Node):
+    def __init__(self, value: Any) -> None:
+        super().__init__(value)
+        # height of the subtree rooted here (a leaf has height 1)
+        self.height = 1
+
+
+def _height(node: AVLNode) -> int:
+    return 0 if node is None else node.height
+
+
+class AVLTree(BinarySearchTree):
+    """
+    A self-balancing binary search tree (https://en.wikipedia.org/wiki/AVL_tree).
+
+    Every node remembers the height of its subtree. After each insert/remove, we walk
+    back up to the root, and wherever the left and right heights differ by more than 1,
+    we "rotate" the nodes to even them out. This keeps the height under ~1.44 log2(n),
+    so lookup/insert/remove are O(log n) even when values arrive in sorted order
+    (which turns a plain BinarySearchTree into a linked list).
+
+    A right rotation around x (a left rotation is the mirror image):
+
+              x                y
+             / \\              / \\
+            y   C    -->     A   x
+           / \\                  / \\
+          A   B                B   C
 
-            # Update the successor's parent to point to NULL as it's child.
-            # (ie disconnect the successor from its original parent)
-            if succ.value < succ.parent.value:
-                succ.parent.left = None
+    Only 3 links change (plus their parent pointers), and the in-order sequence
+    A y B x C stays the same.
+
+    lookup/find_min/find_max/successor and the order-statistic queries (select, rank..)
+    are inherited from BinarySearchTree.
+    """
+
+    def _new_node(self, value: Any) -> AVLNode:
+        return AVLNode(value)
+
+    def _refresh(self, node: AVLNode) -> None:
+        super()._refresh(node)
+        node.height = 1 + max(_height(node.left), _height(node.right))
+
+    def _rotate_right(self, x: AVLNode) -> AVLNode:
+        y = x.left
+        self._replace_child(x.parent, x, y)
+        x.left = y.right
+        if y.right is not None:
+            y.right.parent = x
+        y.right = x
+        x.parent = y
+        self._refresh(x)
+        self._refresh(y)
+        return y
+
+    def _rotate_left(self, x: AVLNode) -> AVLNode:
+        y = x.right
+        self._replace_child(x.parent, x, y)
+        x.right = y.left
+        if y.left is not None:
+            y.left.parent = x
+        y.left = x
+        x.parent = y
+        self._refresh(x)
+        self._refresh(y)
+        return y
+
+    def _rebalance(self, node: AVLNode) -> None:
+        """
+        Walk from `node` up to the root, fixing heights and rotating where needed.
+        A "left-right" shape (left child leaning right) needs a left rotation of the
+        child first, so that a single right rotation can then fix it (and vice versa).
+        """
+        while node is not None:
+            self._refresh(node)
+            balance = _height(node.left) - _height(node.right)
+            if balance > 1:
+                if _height(node.left.left) < _height(node.left.right):
+                    self._rotate_left(node.left)
+                node = self._rotate_right(node)
+            elif balance < -1:
+                if _height(node.right.right) < _height(node.right.left):
+                    self._rotate_right(node.right)
+                node = self._rotate_left(node)
+            node = node.parent
+
+    def insert(self, value: Any) -> None:
+        """
+        Same as BinarySearchTree.insert, then rebalance from the new node's parent.
+        Time complexity: O(log n)
+        """
+        parent, curr = None, self._root
+        while curr is not None:
+            if value > curr.value:
+                parent, curr = curr, curr.right
+            elif value < curr.value:
+                parent, curr = curr, curr.left
             else:
-                succ.parent.right = None
+                return  # already exists!
+        new_node = self._new_node(value)
+        new_node.parent = parent
+        if parent is None:
+            self._root = new_node
+        elif value > parent.value:
+            parent.right = new_node
+        else:
+            parent.left = new_node
+        self._rebalance(parent)
 
-            # Set successor's parent to the removal target node's parent
-            succ.parent = node.parent
+    def remove(self, value: Any) -> None:
+        """
+        Same as BinarySearchTree.remove (the successor node is moved into place, so
+        handles from `lookup`/`successor` stay valid), then rebalance from the lowest
+        node that changed.
+        Time complexity: O(log n)
+        """
+        node = self.lookup(value)
+        if node is None:
+            return
+        self._rebalance(self._unlink(node))
 
-            # Set the removal target node's parent to NULL
-            # (ie. disconnect target node from parent)
-            node.parent = None
+    def height(self) -> int:
+        return _height(self._root)
 
-            # Set the successor's children to the removal target node's children
-            succ.left = node.left
-            succ.right = node.right
 
-            # Set removal target node children's parent to successor
-            if node.left:
-                node.left.parent = succ
-            if node.right:
-                node.right.parent = succ
+def _tree_height(node: Node) -> int:
+    """
+    Height by walking the whole tree (BinarySearchTree nodes don't store it).
+    Iterative, since an unbalanced tree can be deeper than the recursion limit.
+    """
+    height, level = 0, [node] if node else []
+    while level:
+        height += 1
+        level = [c for n in level for c in (n.left, n.right) if c is not None]
+    return height
+
+
+def benchmark_insert_order(n: int = 1_000_000, n_unbalanced: int = 5_000) -> None:
+    """
+    Insert `n` keys in sorted and random order into an AVLTree, and `n_unbalanced`
+    keys into a plain BinarySearchTree (sorted order is O(n^2) there, so 1M would take days).
+    Run with `python -m section_10_trees.main --benchmark`
+    """
+    for cls, size in ((BinarySearchTree, n_unbalanced), (AVLTree, n)):
+        keys = list(range(size))
+        for order in ("sorted", "random"):
+            if order == "random":
+                random.shuffle(keys)
+            tree = cls()
+            start = time.perf_counter()
+            for key in keys:
+                tree.insert(key)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{cls.__name__:>16} {order:>6} n={size:>9,}: {elapsed:7.2f} s, "
+                f"height {_tree_height(tree._root)}"
+            )
+
+
+def benchmark_heap_vs_heapq(n: int = 1_000_000) -> None:
+    """
+    Compare building and draining a BinaryMaxHeap against the C-backed heapq
+    (on negated values, since heapq is a min heap).
+    Run with `python -m section_10_trees.main --benchmark`
+    """
+    values = [random.random() for _ in range(n)]
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
 
-            # Set removal node target children to NULL
-            # (maybe unnecessary, but I want to isolate target node completely)
-            node.left = None
-            node.right = None
+    heap = BinaryMaxHeap()
+    timings = {
+        "insert x n": timed(lambda: [heap.insert(v) for v in values]),
+        "from_iterable": timed(lambda: BinaryMaxHeap.from_iterable(values)),
+        "pop_many(n)": timed(lambda: heap.pop_many(n)),
+    }
+    negated = [-v for v in values]
+    pq = []
+    timings["heapq.heappush x n"] = timed(
+        lambda: [heapq.heappush(pq, v) for v in negated]
+    )
+    timings["heapq.heapify"] = timed(lambda: heapq.heapify(list(negated)))
+    timings["heapq.heappop x n"] = timed(lambda: [heapq.heappop(pq) for _ in range(n)])
+    for name, elapsed in timings.items():
+        print(f"{name:>20} n={n:>9,}: {elapsed:6.2f} s")
 
 
 def traverse(node: Node):
@@ -212,17 +559,25 @@ def traverse(node: Node):
 
 class BinaryMaxHeap:
     """
-    A naive implementation of a binary max heap.
+    A binary max heap stored as a flat array.
     https://visualgo.net/en/heap?slide=5
 
     https://visualgo.net/en/heap/print
     https://en.wikipedia.org/wiki/Binary_heap
 
+    Indices are 0-based, so for the item at index i:
+
+        parent = (i - 1) // 2
+        left   = 2 * i + 1
+        right  = 2 * i + 2
+
+    Build a heap from existing data with `from_iterable` (O(n)) instead of
+    n calls to `insert` (O(n log n)).
+
     Notes
     -----
-    Does not handle duplicates.
+    Duplicates are fine: equal children still get compared against their parent.
     Logs the whole array if LOGLEVEL=debug.
-    Indices are from 1+
     """
 
     def __init__(self):
@@ -231,31 +586,38 @@ class BinaryMaxHeap:
     def __repr__(self) -> str:
         return str(self._data)
 
+    def __len__(self) -> int:
+        return len(self._data)
+
     @property
     def empty(self) -> bool:
         return len(self._data) == 0
 
-    def _iparent(self, i: int) -> int:
+    @classmethod
+    def from_iterable(cls, values: Iterable) -> "BinaryMaxHeap":
         """
-        Returns the INDEX of the parent of item at index `i`
-        To get the parent index of a node at index N, we take N // 2 (integer division)
-        """
-        assert i > 0
-        return i // 2
+        Floyd's heapify: copy the values as-is, then shift down every internal node,
+        starting from the last one and walking back to the root.
 
-    def _ileft(self, i: int) -> int:
-        """
-        Note: Be careful with i=0
-        """
-        assert i > 0
-        return i * 2
+          [1, 3, 2, 6, 4, 9]
 
-    def _iright(self, i: int) -> int:
-        """
-        Note: Be careful with i=0
+                   1
+                 /   \\
+                3     2       < shift_down(2): 2 swaps with 9
+               / \\   /
+              6   4 9         < leaves (the second half of the array) are already heaps
+
+        Half the nodes are leaves and need no work, a quarter move at most one level,
+        an eighth at most two... which sums to O(n), not O(n log n).
         """
-        assert i > 0
-        return i * 2 + 1
+        heap = cls()
+        heap._data = list(values)
+        heap._heapify()
+        return heap
+
+    def _heapify(self):
+        for i in range(len(self._data) // 2 - 1, -1, -1):
+            self._shift_down(i)
 
     def insert(self, v: int):
         """
@@ -267,11 +629,11 @@ class BinaryMaxHeap:
           [6, 4, 3, 2, 1]
         Would look like this..
 
-                  6        < position 1
-                 / \
-                4   3      < positions 2, 3
-               / \
-              2   1        < positions 4, 5
+                  6        < index 0
+                 / \\
+                4   3      < indices 1, 2
+               / \\
+              2   1        < indices 3, 4
 
         We always add elements from LEFT to RIGHT.
 
@@ -282,88 +644,77 @@ class BinaryMaxHeap:
         1. Add to last place
           [6, 4, 3, 2, 1, 9]
         2. Compare with parent, swap if parent < value
-           Parent is at index(9) // 2, so 5//2=2, which corresponds to value 3.
+           Parent is at (index(9) - 1) // 2, so 4//2=2, which corresponds to value 3.
            3 < 9, so swap them.
           [6, 4, 9, 2, 1, 3]
         3. Continue..
-           index(9) // 2, so 2 // 2, so 1
-           4 < 9, so swap them.
-          [6, 9, 4, 2, 1, 3]
-        4. Continue..
-           index(9) // 2, so 1 // 2, so 0
+           (2 - 1) // 2, so 0
            6 < 9, so swap them.
-          [9, 6, 4, 2, 1, 3]
+          [9, 4, 6, 2, 1, 3]
+        4. 9 is at index 0 (the root), so stop.
 
           Done!
         """
-        logging.debug(f"insert({v})")
+        logging.debug("insert(%s)", v)
         self._data.append(v)
-        logging.debug(f"after insert: {self._data}")
-        if len(self._data) == 1:
-            return
         # You will always add values to the end of the array, so the added value will always be a leaf.
         # This means you only have to worry about checking ABOVE it.
-        self._shift_up(len(self._data))
+        self._shift_up(len(self._data) - 1)
+
+    def push_many(self, values: Iterable):
+        """
+        Insert several values at once.
+        A batch at least as big as the heap is cheaper to append and re-heapify
+        in O(n + k) than to shift up one at a time in O(k log(n + k)).
+        """
+        data = self._data
+        start = len(data)
+        data.extend(values)
+        added = len(data) - start
+        if added >= start:
+            self._heapify()
+        else:
+            for i in range(start, len(data)):
+                self._shift_up(i)
 
     def _shift_up(self, i: int):
         """
         See `insert` docstring for an example of how this works.
+        Rather than swapping at every level, hold the new value aside and move
+        smaller parents down into the hole, then drop the value in once.
         """
-        logging.debug(f"shift_up({i})")
-        curr_pos = i
-        parent_pos = self._iparent(curr_pos)
-        while parent_pos and self._data[parent_pos - 1] < self._data[curr_pos - 1]:
-            logging.debug(f"before shift_up: {self._data}")
-            logging.debug(f"swap parent(i={parent_pos}) for current(i={curr_pos})")
-            # fmt: off
-            self._data[parent_pos-1], self._data[curr_pos-1] = self._data[curr_pos-1], self._data[parent_pos-1]
-            logging.debug(f"after shift_up: {self._data}")
-            curr_pos = parent_pos
-            parent_pos = self._iparent(curr_pos)
-            logging.debug(f"curr_pos={curr_pos}, parent_pos={parent_pos}")
-            # fmt: on
+        data = self._data
+        v = data[i]
+        while i > 0:
+            parent = (i - 1) // 2
+            if data[parent] >= v:
+                break
+            data[i] = data[parent]
+            i = parent
+        data[i] = v
+        logging.debug("after shift_up: %s", data)
 
     def _shift_down(self, i: int):
         """
-        While there is a child greater than the current vertex, swap.
+        While there is a child greater than the current vertex, move it up.
+        Always pick the greater child (either one when they are equal), otherwise
+        the smaller child would end up above its sibling.
         """
-        logging.debug(f"shift_down({i})")
-        curr_i = i
-        child_i = self._greater_child_position(curr_i)
-        while child_i:
-            logging.debug(f"before shift_down: {self._data}")
-            logging.debug(
-                f"shift_down: swap child(i={child_i},v={self._data[child_i-1]}) "
-                f"for current(i={curr_i},v={self._data[curr_i-1]}) (1-indexed)"
-            )
-            # fmt: off
-            self._data[curr_i - 1], self._data[child_i - 1] = self._data[child_i - 1], self._data[curr_i - 1]
-            # fmt: on
-            logging.debug(f"after shift_down: {self._data}")
-            curr_i = child_i
-            child_i = self._greater_child_position(curr_i)
-
-    def _greater_child_position(self, i: int) -> int:
-        assert i > 0
-        vself = self._data[i - 1]
-        a_len = len(self._data)
-        ileft = self._ileft(i)
-        iright = self._iright(i)
-        if iright <= a_len:
-            # has both
-            vleft = self._data[ileft - 1]
-            vright = self._data[iright - 1]
-            if vleft > vright and vleft > vself:
-                return ileft
-            elif vright > vleft and vright > vself:
-                return iright
-        elif ileft <= a_len:
-            # has left only
-            vleft = self._data[ileft - 1]
-            if vleft > vself:
-                return ileft
-        # has no children greater than itself
-        return None
+        data = self._data
+        n = len(data)
+        v = data[i]
+        child = 2 * i + 1
+        while child < n:
+            right = child + 1
+            if right < n and data[right] > data[child]:
+                child = right
+            if data[child] <= v:
+                break
+            data[i] = data[child]
+            i = child
+            child = 2 * i + 1
+        data[i] = v
+        logging.debug("after shift_down: %s", data)
 
     def extract_max(self):
         """
@@ -375,23 +726,22 @@ class BinaryMaxHeap:
         the Max Heap property, so we need to then "shift down" the first element by
         comparing it to its children and swapping until we meet this requirement.
         """
-        logging.debug(f"extract_max()")
-        if self.empty:
+        data = self._data
+        if not data:
             return None
-        elif len(self._data) == 1:
-            return self._data.pop()
-        else:
-            # Make the initial swap (root node for last element)
-            logging.debug(f"starting point: {self._data}")
-            self._data[0], self._data[-1] = self._data[-1], self._data[0]
-            logging.debug(f"after initial swap: {self._data}")
-            # Get the last value (which we know is the max) for returning later
-            max_value = self._data.pop()
-            logging.debug(f"after pop: {self._data}")
-            # Shift the element at index 0 downward.
-            # Use 1-based indices to prevent zero-multiplication during child search.
-            self._shift_down(1)
-            return max_value
+        last = data.pop()
+        if not data:
+            return last
+        max_value = data[0]
+        data[0] = last
+        self._shift_down(0)
+        return max_value
+
+    def pop_many(self, k: int) -> List:
+        """
+        Extract up to `k` values, largest first.
+        """
+        return [self.extract_max() for _ in range(min(k, len(self._data)))]
 
     def find_max(self):
         """
@@ -542,9 +892,170 @@ def test_binary_heap():
     assert heap.extract_max() is None
 
 
+def test_binary_heap_bulk():
+    heap = BinaryMaxHeap.from_iterable([1, 3, 2, 6, 4, 9])
+    assert heap._data == [9, 6, 2, 3, 4, 1]
+    assert heap.pop_many(3) == [9, 6, 4] and len(heap) == 3
+
+    # equal children used to stop the shift down, leaving a smaller value on top
+    heap = BinaryMaxHeap()
+    for v in (5, 5, 5, 1, 1):
+        heap.insert(v)
+    assert heap.pop_many(10) == [5, 5, 5, 1, 1]
+    heap = BinaryMaxHeap.from_iterable([1, 7, 7])
+    assert heap.find_max() == 7 and heap.pop_many(3) == [7, 7, 1]
+
+    rng = random.Random(1)
+    values = [rng.randrange(50) for _ in range(2000)]
+    heap = BinaryMaxHeap.from_iterable(values[:1000])
+    heap.push_many(values[1000:1100])  # small batch: shift up each
+    heap.push_many(values[1100:])  # big batch: re-heapify
+    for v in values[:10]:
+        heap.insert(v)
+    assert len(heap) == 2010
+    assert heap.pop_many(2010) == sorted(values + values[:10], reverse=True)
+    assert heap.pop_many(5) == [] and heap.extract_max() is None
+
+
+def test_avl_tree():
+    tree = AVLTree()
+    for v in range(1, 8):
+        tree.insert(v)
+    # sorted inserts still give a perfectly balanced tree
+    exp = {
+        "value": 4,
+        "left": {
+            "value": 2,
+            "left": {"value": 1, "left": None, "right": None},
+            "right": {"value": 3, "left": None, "right": None},
+        },
+        "right": {
+            "value": 6,
+            "left": {"value": 5, "left": None, "right": None},
+            "right": {"value": 7, "left": None, "right": None},
+        },
+    }
+    assert traverse(tree._root) == exp
+    assert tree.successor(tree.lookup(3)).value == 4
+    assert tree.successor(tree.lookup(5)).value == 6
+
+    def check(node: Node, parent: Node = None) -> int:
+        if node is None:
+            return 0
+        assert node.parent is parent
+        left, right = check(node.left, node), check(node.right, node)
+        assert abs(left - right) <= 1 and node.height == 1 + max(left, right)
+        return node.height
+
+    keys = list(range(1000))
+    random.Random(1).shuffle(keys)
+    for v in keys:
+        tree.insert(v)
+    for v in keys[:700]:
+        tree.remove(v)
+    tree.remove(-1)
+    check(tree._root)
+    # removing a node with 2 children moves its successor node, it doesn't copy values
+    node = tree._root
+    succ = tree.successor(node)
+    tree.remove(node.value)
+    assert node.parent is None and tree.lookup(succ.value) is succ
+    keys.remove(node.value)
+    check(tree._root)
+    remaining = sorted(keys[700:])
+    node, values = tree.find_min(tree._root), []
+    while node:
+        values.append(node.value)
+        node = tree.successor(node)
+    assert values == remaining and tree.height() <= 12
+
+
+def test_bulk_build():
+    bst = BinarySearchTree.from_sorted([1, 4, 6, 9, 15, 20, 170])
+    exp = {
+        "value": 9,
+        "left": {
+            "value": 4,
+            "left": {"value": 1, "left": None, "right": None},
+            "right": {"value": 6, "left": None, "right": None},
+        },
+        "right": {
+            "value": 20,
+            "left": {"value": 15, "left": None, "right": None},
+            "right": {"value": 170, "left": None, "right": None},
+        },
+    }
+    assert traverse(bst._root) == exp
+    assert bst.lookup(15).parent.value == 20 and bst._root.parent is None
+    assert bst.successor(bst.lookup(6)).value == 9
+    assert list(BinarySearchTree.from_sorted([])) == []
+    try:
+        BinarySearchTree.from_sorted([2, 1])
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    merged = bst.merge(BinarySearchTree.from_sorted([2, 4, 8, 200]))
+    assert list(merged) == [1, 2, 4, 6, 8, 9, 15, 20, 170, 200]
+    assert _tree_height(merged._root) == 4
+
+    avl = AVLTree.from_sorted(range(100))
+    assert avl.height() == 7 and list(avl) == list(range(100))
+    for v in range(0, 100, 2):
+        avl.remove(v)
+    avl.insert(1000)
+    assert list(avl) == list(range(1, 100, 2)) + [1000] and avl.height() <= 7
+
+
+def test_order_statistics():
+    def check(node: Node, parent: Node = None) -> int:
+        if node is None:
+            return 0
+        assert node.parent is parent
+        assert node.size == 1 + check(node.left, node) + check(node.right, node)
+        return node.size
+
+    for cls in (BinarySearchTree, AVLTree):
+        tree, values = cls(), set()
+        rng = random.Random(1)
+        for _ in range(2000):
+            v = rng.randrange(500)
+            if rng.random() < 0.6:
+                tree.insert(v)
+                values.add(v)
+            else:
+                tree.remove(v)
+                values.discard(v)
+        check(tree._root)
+        ordered = sorted(values)
+        assert list(tree) == ordered and len(tree) == len(ordered)
+        assert [tree.select(k) for k in range(len(ordered))] == ordered
+        for low, high in ((-5, 600), (100, 200), (250, 250), (300, 100), (17, 18)):
+            expected = [v for v in ordered if low <= v < high]
+            assert list(tree.range(low, high)) == expected
+            assert tree.count_range(low, high) == len(expected)
+            assert tree.rank(low) == sum(1 for v in ordered if v < low)
+        try:
+            tree.select(len(ordered))
+            assert False, "expected IndexError"
+        except IndexError:
+            pass
+    # removing the root (with 2 children) keeps the rest of the tree
+    bst = BinarySearchTree.from_sorted([1, 2, 3, 4, 5])
+    bst.remove(3)
+    assert list(bst) == [1, 2, 4, 5] and bst._root.size == 4
+
+
 def main():
     test_binary_search_tree()
     test_binary_heap()
+    test_binary_heap_bulk()
+    test_avl_tree()
+    test_bulk_build()
+    test_order_statistics()
+    if "--benchmark" in sys.argv:
+        benchmark_insert_order()
+        benchmark_heap_vs_heapq()
 
 
 if __name__ == "__main__":